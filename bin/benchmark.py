@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Scaling benchmark of the workflow's report stages on synthetic cohorts.
+For each cohort size, per-sample call logs and bcftools stats, a square VCF
+with smoove's sample headers, an indexcov ped, and a sample sheet are
+generated, then svsummary.py, smoove_report.py, and merge_peds.py are run
+on them. Wall time, peak RSS, and output size of each stage are written as
+tab delimited text.
+
+    benchmark.py --samples 10 1000 10000 50000 --output benchmark.tsv
+    benchmark.py --samples 10 1000 --baseline benchmark.tsv
+
+With --baseline, stages that take longer or use more memory than the
+baseline by more than --tolerance are reported and the exit status is 1.
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BIN = os.path.dirname(os.path.abspath(__file__))
+SVTYPES = ["DEL", "DEL", "DEL", "DUP", "INV", "BND"]
+CHROMS = ["chr%d" % i for i in range(1, 23)] + ["chrX", "chrY"]
+# columns of a wide sample sheet, as in biobank manifests
+SHEET_COLUMNS = 50
+FIELDS = ["samples", "stage", "seconds", "max_rss_mb", "output_mb"]
+
+
+def sample_names(n):
+    return ["S%06d" % i for i in range(n)]
+
+
+def write_calls(directory, samples, rng):
+    """Per-sample smoove call logs and bcftools stats."""
+    for sample in samples:
+        with open(os.path.join(directory, "%s-smoove-call.log" % sample), "w") as fh:
+            print("[smoove-nf] extracted splits and discordants from %d total aligned reads"
+                  % rng.randint(4e8, 9e8), file=fh)
+            for _ in range(20):
+                print("[smoove] %s lumpy_filter progress" % sample, file=fh)
+        with open(os.path.join(directory, "%s-stats.txt" % sample), "w") as fh:
+            print("# This file was produced by bcftools stats", file=fh)
+            print("ID\t0\t%s-smoove.genotyped.vcf.gz" % sample, file=fh)
+            print("SN\t0\tnumber of samples:\t1", file=fh)
+            print("SN\t0\tnumber of records:\t%d" % rng.randint(5000, 12000), file=fh)
+
+
+def write_vcf(path, samples, sites, rng):
+    """Square VCF with GT:DHFFC columns and smoove's sample headers."""
+    genotypes = ["0/0:1.0"] * 90 + ["0/1:0.5"] * 7 + ["1/1:0.1"] * 2 + ["./.:."]
+    with gzip.open(path, "wt", compresslevel=1) as fh:
+        print("##fileformat=VCFv4.2", file=fh)
+        for chrom in CHROMS:
+            print("##contig=<ID=%s,length=%d>" % (chrom, 250000000), file=fh)
+        for sample in samples:
+            print("##SAMPLE=<ID=%s>" % sample, file=fh)
+            print("##smoove_count_stats=%s:%d,%d,%d,%d" % (sample, rng.randint(1e6, 2e6), rng.randint(1e6, 2e6),
+                                                           rng.randint(1e5, 2e5), rng.randint(1e5, 2e5)), file=fh)
+        print("#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", *samples, sep="\t", file=fh)
+        per_chrom = max(1, sites // len(CHROMS))
+        site = 0
+        for chrom in CHROMS:
+            positions = sorted(rng.randint(1, 240000000) for _ in range(per_chrom))
+            for pos in positions:
+                svtype = rng.choice(SVTYPES)
+                length = int(rng.expovariate(1 / 5000.0)) + 50
+                if svtype == "BND":
+                    alt = "N[%s:%d[" % (rng.choice(CHROMS), rng.randint(1, 240000000))
+                    info = "SVTYPE=BND"
+                else:
+                    alt = "<%s>" % svtype
+                    info = "SVTYPE=%s;SVLEN=%d;END=%d" % (svtype, -length if svtype == "DEL" else length, pos + length)
+                print(chrom, pos, site, "N", alt, ".", ".", info, "GT:DHFFC",
+                      "\t".join(rng.choice(genotypes) for _ in samples), sep="\t", file=fh)
+                site += 1
+
+
+def write_ped(path, samples, rng):
+    """indexcov ped with sex, copy number, bin counts, and PCs."""
+    with open(path, "w") as fh:
+        print("#family_id", "sample_id", "paternal_id", "maternal_id", "sex", "phenotype", "CNchrX", "CNchrY",
+              "bins.out", "bins.lo", "bins.in", "p.out", "PC1", "PC2", "PC3", "PC4", "PC5", sep="\t", file=fh)
+        for sample in samples:
+            sex = rng.choice([1, 2])
+            print(sample, sample, 0, 0, sex, -9, "%.2f" % (2.0 if sex == 2 else 1.0), "%.2f" % (1.0 if sex == 1 else 0),
+                  rng.randint(0, 5000), rng.randint(0, 5000), rng.randint(150000, 180000), "%.3f" % rng.random(),
+                  *["%.2f" % rng.gauss(0, 10) for _ in range(5)], sep="\t", file=fh)
+
+
+def write_sheet(path, samples, rng):
+    """Sample sheet of many columns in a different order than the ped."""
+    rows = list(samples)
+    rng.shuffle(rows)
+    with open(path, "w") as fh:
+        print("sample_id", *["field%02d" % i for i in range(SHEET_COLUMNS)], sep="\t", file=fh)
+        for sample in rows:
+            print(sample, *["v%d" % rng.randint(0, 1000) for _ in range(SHEET_COLUMNS)], sep="\t", file=fh)
+
+
+def run(cmd, directory):
+    """Wall seconds and peak RSS (MB) of a shell command and its children."""
+    start = time.time()
+    with open(os.devnull, "w") as devnull:
+        p = subprocess.Popen(cmd, shell=True, cwd=directory, stdout=devnull)
+        _, status, usage = os.wait4(p.pid, 0)
+    seconds = time.time() - start
+    # reaped here, so Popen must not wait on it
+    p.returncode = os.WEXITSTATUS(status)
+    if p.returncode != 0:
+        raise RuntimeError("failed with status %d: %s" % (p.returncode, cmd))
+    # kilobytes on Linux, bytes on macOS
+    scale = 1024.0 * 1024 if sys.platform == "darwin" else 1024.0
+    return seconds, usage.ru_maxrss / scale
+
+
+def size_mb(directory, names):
+    return sum(os.path.getsize(os.path.join(directory, n)) for n in names) / 1e6
+
+
+def benchmark(n, sites, directory, seed):
+    rng = random.Random(seed)
+    samples = sample_names(n)
+    write_calls(directory, samples, rng)
+    write_vcf(os.path.join(directory, "square.vcf.gz"), samples, sites, rng)
+    write_ped(os.path.join(directory, "indexcov.ped"), samples, rng)
+    write_sheet(os.path.join(directory, "sheet.tsv"), samples, rng)
+    with open(os.path.join(directory, "sequence_counts.txt"), "w") as fh:
+        fh.write("".join("%s-smoove-call.log\n" % s for s in samples))
+    with open(os.path.join(directory, "variant_counts.txt"), "w") as fh:
+        fh.write("".join("%s-stats.txt\n" % s for s in samples))
+
+    stages = [
+        ("svsummary", "gzip -dc square.vcf.gz | %s %s/svsummary.py tee summary.json > /dev/null"
+         % (sys.executable, BIN), ["summary.json"]),
+        ("smoove_report", "%s %s/smoove_report.py --summary summary.json --ped indexcov.ped "
+         "--sequence-counts @sequence_counts.txt --variant-counts @variant_counts.txt --sexchroms chrX,chrY"
+         % (sys.executable, BIN), ["smoove-nf.html", "report.cache.json"]),
+        ("smoove_report_cached", "%s %s/smoove_report.py --summary summary.json --ped indexcov.ped "
+         "--sequence-counts @sequence_counts.txt --variant-counts @variant_counts.txt --sexchroms chrX,chrY "
+         "--previous-cache report.cache.json --cache report.cache.next.json"
+         % (sys.executable, BIN), ["smoove-nf.html"]),
+        ("merge_peds", "%s %s/merge_peds.py indexcov.ped sheet.tsv --output merged.ped"
+         % (sys.executable, BIN), ["merged.ped"]),
+    ]
+    for stage, cmd, outputs in stages:
+        seconds, rss = run(cmd + " 2> %s.log" % stage, directory)
+        yield dict(samples=n, stage=stage, seconds="%.2f" % seconds, max_rss_mb="%.1f" % rss,
+                   output_mb="%.2f" % size_mb(directory, outputs))
+
+
+def regressions(results, baseline_file, tolerance):
+    with open(baseline_file) as fh:
+        baseline = dict(((int(r["samples"]), r["stage"]), r) for r in csv.DictReader(fh, delimiter="\t"))
+    for result in results:
+        previous = baseline.get((result["samples"], result["stage"]))
+        if previous is None:
+            continue
+        for metric in ("seconds", "max_rss_mb"):
+            # small values are dominated by noise
+            if float(result[metric]) > max(float(previous[metric]) * tolerance, float(previous[metric]) + 1):
+                yield "%d samples, %s: %s %s vs %s" % (result["samples"], result["stage"], metric, result[metric],
+                                                       previous[metric])
+
+
+def main(args):
+    results = []
+    writer = csv.DictWriter(sys.stdout, FIELDS, delimiter="\t", lineterminator="\n")
+    writer.writeheader()
+    for n in args.samples:
+        directory = tempfile.mkdtemp(prefix="smoove-bench-%d-" % n, dir=args.workdir)
+        try:
+            for result in benchmark(n, args.sites, directory, args.seed):
+                writer.writerow(result)
+                sys.stdout.flush()
+                results.append(result)
+        finally:
+            if not args.keep:
+                shutil.rmtree(directory)
+    if args.output:
+        with open(args.output, "w") as fh:
+            out = csv.DictWriter(fh, FIELDS, delimiter="\t", lineterminator="\n")
+            out.writeheader()
+            out.writerows(results)
+    if args.baseline:
+        slower = list(regressions(results, args.baseline, args.tolerance))
+        for line in slower:
+            print("regression: %s" % line, file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--samples", type=int, nargs="+", default=[10, 1000, 10000, 50000], help="cohort sizes")
+    p.add_argument("--sites", type=int, default=1000, help="sites of the square VCF")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--workdir", help="directory of the synthetic cohorts; the system temp directory by default")
+    p.add_argument("--keep", action="store_true", help="keep the synthetic cohorts")
+    p.add_argument("--output", help="also write the results to this file, e.g. as a later --baseline")
+    p.add_argument("--baseline", help="results of a previous run to compare against")
+    p.add_argument("--tolerance", type=float, default=1.25,
+                   help="allowed ratio of time and peak RSS over the baseline")
+    main(p.parse_args())
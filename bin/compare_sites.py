@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Compares two site sets of one cohort, e.g. the flat `smoove merge` and the
+--mergebatch tree merge. Sites are matched one to one by chromosome and SV
+type, by reciprocal overlap, or for break ends by distance. The supporting
+samples (SNAME) of matched sites are compared as well. Counts per SV type
+are written as tab delimited text.
+
+    compare_sites.py flat/results/smoove/merged/cohort.sites.vcf.gz \\
+        tree/results/smoove/merged/cohort.sites.vcf.gz
+
+The exit status is 1 when more than --max-unmatched of the sites of either
+set have no match in the other.
+"""
+from __future__ import print_function
+
+import argparse
+import bisect
+import gzip
+import sys
+
+from collections import Counter, defaultdict
+
+
+FIELDS = ["svtype", "first", "second", "identical", "matched", "first_only", "second_only",
+          "same_samples"]
+
+
+def info_value(info, key):
+    for field in info.split(";"):
+        k, _, v = field.partition("=")
+        if k == key:
+            return v
+    return None
+
+
+def read_sites(path):
+    """Sites of a VCF keyed by (chrom, svtype) as sorted (start, end, samples)."""
+    sites = defaultdict(list)
+    with (gzip.open(path, "rt") if path.endswith(".gz") else open(path)) as fh:
+        for line in fh:
+            if line.startswith("#"):
+                continue
+            toks = line.split("\t", 8)
+            start, info = int(toks[1]), toks[7]
+            svtype = info_value(info, "SVTYPE") or "."
+            end = info_value(info, "END")
+            end = int(end) if end and svtype != "BND" else start
+            # SNAME is a list of sample:id of the calls merged into the site
+            sname = info_value(info, "SNAME")
+            samples = frozenset(s.rsplit(":", 1)[0] for s in sname.split(",")) if sname else frozenset()
+            sites[(toks[0], svtype)].append((start, max(start, end), samples))
+    for key in sites:
+        sites[key].sort()
+    return sites
+
+
+def overlap(a, b, min_overlap):
+    o = min(a[1], b[1]) - max(a[0], b[0]) + 1
+    return o if o >= min_overlap * (a[1] - a[0] + 1) and o >= min_overlap * (b[1] - b[0] + 1) else 0
+
+
+def match(first, second, svtype, min_overlap, bnd_window):
+    """One to one matches of sorted sites, each to its best unused candidate."""
+    starts = [s[0] for s in second]
+    used = set()
+    for site in first:
+        if svtype == "BND":
+            lo = bisect.bisect_left(starts, site[0] - bnd_window)
+            hi = bisect.bisect_right(starts, site[0] + bnd_window)
+            score = lambda other: bnd_window + 1 - abs(other[0] - site[0])
+        else:
+            length = site[1] - site[0] + 1
+            # a site with enough reciprocal overlap has to start within this window
+            lo = bisect.bisect_left(starts, site[0] - int(length * (1 - min_overlap) / min_overlap) - 1)
+            hi = bisect.bisect_right(starts, site[1])
+            score = lambda other: overlap(site, other, min_overlap)
+        best, best_score = None, 0
+        for i in range(lo, hi):
+            if i in used:
+                continue
+            s = score(second[i])
+            if s > best_score:
+                best, best_score = i, s
+        if best is not None:
+            used.add(best)
+            yield site, second[best]
+
+
+def compare(first, second, min_overlap, bnd_window):
+    counts = defaultdict(Counter)
+    for key in set(first) | set(second):
+        svtype = key[1]
+        a, b = first.get(key, []), second.get(key, [])
+        counts[svtype]["first"] += len(a)
+        counts[svtype]["second"] += len(b)
+        for x, y in match(a, b, svtype, min_overlap, bnd_window):
+            counts[svtype]["matched"] += 1
+            counts[svtype]["identical"] += x[:2] == y[:2]
+            counts[svtype]["same_samples"] += x[2] == y[2]
+    for c in counts.values():
+        c["first_only"] = c["first"] - c["matched"]
+        c["second_only"] = c["second"] - c["matched"]
+    total = Counter()
+    for c in counts.values():
+        total.update(c)
+    counts["all"] = total
+    return counts
+
+
+def main(args):
+    counts = compare(read_sites(args.first), read_sites(args.second), args.min_overlap, args.bnd_window)
+    print("\t".join(FIELDS))
+    for svtype in sorted(counts, key=lambda k: (k == "all", k)):
+        print(svtype, *[counts[svtype][f] for f in FIELDS[1:]], sep="\t")
+    total = counts["all"]
+    unmatched = max(float(total["first_only"]) / max(total["first"], 1),
+                    float(total["second_only"]) / max(total["second"], 1))
+    print("%.2f%% of sites are unmatched" % (100 * unmatched), file=sys.stderr)
+    if unmatched > args.max_unmatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("first", help="sites VCF, e.g. of the flat merge")
+    p.add_argument("second", help="sites VCF, e.g. of the tree merge")
+    p.add_argument("--min-overlap", type=float, default=0.5,
+                   help="reciprocal overlap of matching DEL, DUP, and INV sites")
+    p.add_argument("--bnd-window", type=int, default=1000,
+                   help="largest distance between matching break ends")
+    p.add_argument("--max-unmatched", type=float, default=0.01,
+                   help="largest allowed fraction of the sites of either set without a match")
+    main(p.parse_args())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Fit the coefficients of the resource model in nextflow.config from the
+trace of a previous run. Memory and time are modeled as <base> + <per_gb> *
+GB of input + <per_file> * input files. The input of each task is the files
+main.nf sizes it by (alignments, sites, VCFs, or indexes), recorded in the
+task's tag as input_bytes=<n> files=<n>.
+
+    fit_resources.py results/logs/trace.txt > resources.config
+    nextflow run brwnj/smoove-nf -c resources.config ...
+"""
+from __future__ import print_function
+
+import argparse
+import logging
+import re
+
+from nftrace import read_trace
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+MODELS = {
+    "smoove_call": "call",
+    "smoove_genotype": "genotype",
+    "smoove_merge": "merge",
+    "smoove_merge_batch": "merge",
+    "smoove_merge_group": "merge",
+    "smoove_merge_tree": "merge",
+    "smoove_square": "square",
+    "square_paste_batch": "square",
+    "square_region": "square_region",
+    "square_concat": "square_concat",
+    "run_indexcov": "indexcov",
+    "run_indexcov_batch": "indexcov",
+    "combine_indexcov": "combine_indexcov",
+}
+INPUT_BYTES = re.compile(r"input_bytes=(\d+)")
+INPUT_FILES = re.compile(r"files=(\d+)")
+# lower bounds for the fitted base, in GB and hours
+MIN_MEMORY = 1
+MIN_TIME = 0.25
+
+
+def quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def centered(values):
+    mean = sum(values) / float(len(values))
+    return [v - mean for v in values]
+
+
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def slopes(features, ys):
+    """Non-negative least squares slopes of the two features. When both
+    slopes cannot be fit together, e.g. every task read one file, the better
+    of the single feature fits is kept.
+    """
+    a, b = centered(features[0]), centered(features[1])
+    y = centered(ys)
+    aa, bb, ab = dot(a, a), dot(b, b), dot(a, b)
+    det = aa * bb - ab * ab
+    if det > 1e-12 * max(aa * bb, 1e-300):
+        sa = (bb * dot(a, y) - ab * dot(b, y)) / det
+        sb = (aa * dot(b, y) - ab * dot(a, y)) / det
+        if sa >= 0 and sb >= 0:
+            return sa, sb
+    sa = max(0.0, dot(a, y) / aa) if aa > 0 else 0.0
+    sb = max(0.0, dot(b, y) / bb) if bb > 0 else 0.0
+    residual = lambda fitted: sum((v - f) ** 2 for v, f in zip(y, fitted))
+    if residual([sa * v for v in a]) <= residual([sb * v for v in b]):
+        return sa, 0.0
+    return 0.0, sb
+
+
+def fit(gbs, files, ys, q):
+    """Least squares slopes with the intercept raised until a fraction q of
+    the observations fall on or under the fitted plane.
+    """
+    per_gb, per_file = slopes([gbs, files], ys)
+    intercept = quantile([y - per_gb * g - per_file * f for g, f, y in zip(gbs, files, ys)], q)
+    return intercept, per_gb, per_file
+
+
+def main(args):
+    observations = dict((model, []) for model in MODELS.values())
+    for row in read_trace(args.trace):
+        model = MODELS.get(row["process"])
+        if model is None or row.get("status") != "COMPLETED":
+            continue
+        input_bytes = INPUT_BYTES.search(row.get("tag") or "")
+        input_files = INPUT_FILES.search(row.get("tag") or "")
+        if input_bytes is None or row.get("peak_rss") is None or row.get("realtime") is None:
+            continue
+        observations[model].append((int(input_bytes.group(1)) / 1e9, int(input_files.group(1)) if input_files else 1,
+                                    row["peak_rss"] / 1024 ** 3, row["realtime"] / 3600))
+
+    print("// fitted by fit_resources.py from %s" % args.trace)
+    print("params {")
+    print("    resources {")
+    for model in sorted(set(MODELS.values())):
+        points = observations[model]
+        if len(points) < args.min_tasks:
+            logging.warning("%s: %d completed tasks, keeping the configured model" % (model, len(points)))
+            continue
+        gbs = [p[0] for p in points]
+        files = [p[1] for p in points]
+        logging.info("%s: fitted from %d tasks" % (model, len(points)))
+        for resource, column, minimum in (("memory", 2, MIN_MEMORY), ("time", 3, MIN_TIME)):
+            base, per_gb, per_file = fit(gbs, files, [p[column] for p in points], args.quantile)
+            print("        %s_%s = %.2f" % (model, resource, max(minimum, base * args.headroom)))
+            print("        %s_%s_per_gb = %.4f" % (model, resource, per_gb * args.headroom))
+            print("        %s_%s_per_file = %.4f" % (model, resource, per_file * args.headroom))
+    print("    }")
+    print("}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("trace", help="trace.txt of a previous run")
+    p.add_argument("--quantile", type=float, default=0.95,
+                   help="fraction of observed tasks the fitted model must cover (default: %(default)s)")
+    p.add_argument("--headroom", type=float, default=1.2,
+                   help="multiplier applied to the fitted coefficients (default: %(default)s)")
+    p.add_argument("--min-tasks", type=int, default=3,
+                   help="completed tasks required to fit a process (default: %(default)s)")
+    main(p.parse_args())
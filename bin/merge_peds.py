@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Join the indexcov ped with one or more sample sheets on their sample ID
+column. Sheets are indexed by the byte offset of each sample's row and the
+ped is streamed against them, so rows are written as they are joined.
+
+    merge_peds.py sites-indexcov.ped custom.ped [sheet ...] > merged.ped
+"""
+from __future__ import print_function
+
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+omit_from_indexcov = ["#family_id", "paternal_id", "maternal_id", "phenotype", "p.out", "PC4", "PC5"]
+indexcov_sample_col = "sample_id"
+sep = "\t"
+# unmatched and duplicated IDs listed in the log, with the rest counted
+max_listed_ids = 20
+
+
+def is_gzipped(f):
+    with open(f, "rb") as fh:
+        return fh.read(2) == b"\x1f\x8b"
+
+
+def gzopen(f):
+    if is_gzipped(f):
+        return gzip.open(f, "rt")
+    else:
+        return open(f)
+
+
+def listed(ids):
+    ids = sorted(ids)
+    more = " and %d more" % (len(ids) - max_listed_ids) if len(ids) > max_listed_ids else ""
+    return ", ".join(ids[:max_listed_ids]) + more
+
+
+class SheetIndex(object):
+    """Byte offset of each sample's row of a sample sheet, so rows are read
+    as they are joined rather than held in memory. Gzipped sheets are first
+    decompressed into the working directory, as gzip streams cannot seek cheaply.
+    """
+
+    def __init__(self, path, sample_col):
+        self.name = path
+        self.path = path
+        self.decompressed = is_gzipped(path)
+        if self.decompressed:
+            fd, self.path = tempfile.mkstemp(prefix="sheet-", suffix=".txt", dir=".")
+            with gzip.open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        self.fh = open(self.path, "rb")
+        self.header = self.fh.readline().decode().rstrip("\r\n").split(sep)
+        try:
+            key = self.header.index(sample_col)
+        except ValueError:
+            logging.critical(" you may need to change `--samplecol` to reflect your sample ID column")
+            raise KeyError(sample_col)
+        self.offsets = {}
+        self.duplicates = set()
+        offset = self.fh.tell()
+        for line in self.fh:
+            if not line.strip():
+                offset += len(line)
+                continue
+            sample = line.split(sep.encode(), key + 1)[key].rstrip(b"\r\n").decode()
+            if sample in self.offsets:
+                self.duplicates.add(sample)
+            # the last row of a duplicated ID is used
+            self.offsets[sample] = offset
+            offset += len(line)
+        self.matched = set()
+
+    def row(self, sample):
+        """Values of a sample's row by column, or None."""
+        if sample not in self.offsets:
+            return None
+        self.matched.add(sample)
+        self.fh.seek(self.offsets[sample])
+        return dict(zip(self.header, self.fh.readline().decode().rstrip("\r\n").split(sep)))
+
+    def close(self):
+        self.fh.close()
+        if self.decompressed:
+            os.remove(self.path)
+
+
+def merge(standard_ped_file, sheet_files, sample_col, out):
+    """Writes the indexcov ped joined with the sheets to `out`."""
+    sheets = [SheetIndex(f, sample_col) for f in sheet_files]
+    for sheet in sheets:
+        logging.info("%s: %d samples" % (sheet.name, len(sheet.offsets)))
+
+    # custom columns in sheet order; a column already present is not repeated
+    custom_header = []
+    for sheet in sheets:
+        custom_header.extend(c for c in sheet.header if c not in custom_header)
+    omit = omit_from_indexcov + ([indexcov_sample_col] if indexcov_sample_col in custom_header else [])
+
+    unmatched = [[] for _ in sheets]
+    indexcov_samples = set()
+    with gzopen(standard_ped_file) as fh:
+        indexcov_header = fh.readline().rstrip("\n").split(sep)
+        header = [i for i in indexcov_header if i not in omit]
+        merged_header = custom_header + [i for i in header if i not in custom_header]
+        print(*merged_header, sep=sep, file=out)
+        for line in fh:
+            row = dict(zip(indexcov_header, line.rstrip("\n").split(sep)))
+            sample = row[indexcov_sample_col]
+            indexcov_samples.add(sample)
+            merged_row = {}
+            for i, sheet in enumerate(sheets):
+                sample_data = sheet.row(sample)
+                if sample_data is None:
+                    unmatched[i].append(sample)
+                    continue
+                for col, value in sample_data.items():
+                    merged_row.setdefault(col, value)
+            # indexcov data
+            for col in header:
+                merged_row[col] = row[col]
+            # indexcov values fill custom columns of samples absent from a sheet
+            print(*[merged_row.get(col, row.get(col, "")) for col in merged_header], sep=sep, file=out)
+
+    for sheet, missing in zip(sheets, unmatched):
+        if missing:
+            logging.warning("%d of %d samples were not present in %s: %s"
+                            % (len(missing), len(indexcov_samples), sheet.name, listed(missing)))
+        if sheet.duplicates:
+            logging.warning("%d sample IDs of %s have more than one row; the last was used: %s"
+                            % (len(sheet.duplicates), sheet.name, listed(sheet.duplicates)))
+        extra = set(sheet.offsets) - sheet.matched
+        if extra:
+            logging.info("%d samples of %s are not in the indexcov output" % (len(extra), sheet.name))
+        sheet.close()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("ped", help="indexcov ped")
+    p.add_argument("sheets", nargs="+", help="tab delimited sample sheets, optionally gzipped; earlier sheets' values win")
+    p.add_argument("--samplecol", default="sample_id", help="column of sample IDs in the sample sheets")
+    p.add_argument("--output", default="-", help="merged ped; written to stdout by default")
+    args = p.parse_args()
+    if args.output == "-":
+        merge(args.ped, args.sheets, args.samplecol, sys.stdout)
+    else:
+        with open(args.output, "w") as out:
+            merge(args.ped, args.sheets, args.samplecol, out)
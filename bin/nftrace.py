@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Parsing for Nextflow trace files (logs/trace.txt), with or without
+`trace.raw`. Values are converted to bytes, seconds, and fractions.
+"""
+from __future__ import print_function
+
+import csv
+import re
+
+from datetime import datetime
+
+
+MEMORY_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4, "PB": 1024 ** 5}
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+MEMORY_FIELDS = ("memory", "peak_rss", "peak_vmem", "rss", "vmem", "rchar", "wchar", "read_bytes", "write_bytes")
+DURATION_FIELDS = ("time", "duration", "realtime")
+TIMESTAMP_FIELDS = ("submit", "start", "complete")
+
+
+def parse_memory(value):
+    """'1.5 GB' or raw bytes to bytes."""
+    value = value.strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    number, _, unit = value.partition(" ")
+    return float(number) * MEMORY_UNITS[unit.strip().upper()]
+
+
+def parse_duration(value):
+    """'1h 2m 3s', '350ms', or raw milliseconds to seconds."""
+    value = value.strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value) / 1000
+    except ValueError:
+        pass
+    seconds = 0.0
+    for number, unit in re.findall(r"([\d.]+)\s*(ms|d|h|m|s)", value):
+        seconds += float(number) * DURATION_UNITS[unit]
+    return seconds
+
+
+def parse_percent(value):
+    """'95.3%' to 0.953; CPU usage may exceed 1 with several cpus."""
+    value = value.strip().rstrip("%")
+    if value in ("", "-"):
+        return None
+    return float(value) / 100
+
+
+def parse_timestamp(value):
+    """'2019-01-16 21:45:01.123' or raw epoch milliseconds to epoch seconds."""
+    value = value.strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value) / 1000
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+        try:
+            dt = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return (dt - datetime(1970, 1, 1)).total_seconds()
+    return None
+
+
+def process_name(row):
+    """The process of a trace row, from `process` or from `name`."""
+    if row.get("process"):
+        return row["process"]
+    return row.get("name", "").partition(" (")[0]
+
+
+def read_trace(path):
+    """Rows of a trace file as dicts with parsed values."""
+    rows = []
+    with open(path) as fh:
+        reader = csv.DictReader(fh, delimiter="\t")
+        for row in reader:
+            for field in MEMORY_FIELDS:
+                if field in row:
+                    row[field] = parse_memory(row[field])
+            for field in DURATION_FIELDS:
+                if field in row:
+                    row[field] = parse_duration(row[field])
+            for field in TIMESTAMP_FIELDS:
+                if field in row:
+                    row[field] = parse_timestamp(row[field])
+            if "%cpu" in row:
+                row["%cpu"] = parse_percent(row["%cpu"])
+            for field in ("cpus", "attempt", "exit"):
+                if row.get(field, "-") not in ("", "-"):
+                    try:
+                        row[field] = int(row[field])
+                    except ValueError:
+                        pass
+            row["process"] = process_name(row)
+            rows.append(row)
+    return rows
@@ -0,0 +1,76 @@
+#!/usr/bin/env perl
+#
+# Populate a CRAM reference MD5 cache from a FASTA file without network
+# access. Adapted from samtools' misc/seq_cache_populate.pl (MIT license,
+# Genome Research Ltd.) so that tasks no longer need to fetch it at runtime.
+#
+# Usage: seq_cache_populate.pl -root <dir> [-subdirs 2] <fasta>[.gz] ...
+#
+# Sequences are written to <dir>/xx/yy/<rest of md5> which matches
+# REF_PATH=<dir>/%2s/%2s/%s
+
+use strict;
+use warnings;
+use Digest::MD5;
+use File::Path qw(make_path);
+use File::Temp qw(tempfile);
+use Getopt::Long;
+
+my $root;
+my $subdirs = 2;
+GetOptions("root=s" => \$root, "subdirs=i" => \$subdirs)
+    or die "Usage: $0 -root <dir> [-subdirs <n>] <fasta> ...\n";
+die "Usage: $0 -root <dir> [-subdirs <n>] <fasta> ...\n" unless ($root && @ARGV);
+die "-subdirs must be between 0 and 15\n" if ($subdirs < 0 || $subdirs > 15);
+
+make_path($root);
+
+my ($written, $existing) = (0, 0);
+foreach my $fasta (@ARGV) {
+    my $fh;
+    if ($fasta =~ /\.gz$/) {
+        open($fh, "-|", "gzip", "-dc", $fasta) or die "Couldn't open $fasta: $!\n";
+    } else {
+        open($fh, "<", $fasta) or die "Couldn't open $fasta: $!\n";
+    }
+    my ($name, $seq) = (undef, "");
+    while (my $line = <$fh>) {
+        if ($line =~ /^>(\S*)/) {
+            store($name, \$seq) if (defined $name);
+            ($name, $seq) = ($1, "");
+            next;
+        }
+        # the CRAM M5 is computed on upper case sequence with anything
+        # outside of printable ASCII removed
+        $line =~ tr/a-z/A-Z/;
+        $line =~ s/[^!-~]//g;
+        $seq .= $line;
+    }
+    store($name, \$seq) if (defined $name);
+    close($fh) or die "Error reading $fasta\n";
+}
+print STDERR "Wrote $written new and found $existing existing sequences under $root\n";
+
+sub store {
+    my ($name, $seq) = @_;
+    my $md5 = Digest::MD5::md5_hex($$seq);
+    my $dir = $root;
+    my $file = $md5;
+    for (my $i = 0; $i < $subdirs; $i++) {
+        $dir .= "/" . substr($file, 0, 2);
+        $file = substr($file, 2);
+    }
+    my $path = "$dir/$file";
+    if (-e $path) {
+        $existing++;
+        return;
+    }
+    make_path($dir);
+    my ($out, $tmp) = tempfile(DIR => $dir, SUFFIX => ".tmp");
+    print $out $$seq or die "Error writing $tmp: $!\n";
+    close($out) or die "Error writing $tmp: $!\n";
+    chmod(0644, $tmp);
+    rename($tmp, $path) or die "Couldn't rename $tmp to $path: $!\n";
+    print STDERR "$name\t$md5\n";
+    $written++;
+}
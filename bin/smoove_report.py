@@ -0,0 +1,791 @@
+#!/usr/bin/env python
+"""
+Workflow report of smoove-nf, written to a single HTML file from the
+per-sample call logs and bcftools stats, the square VCF summary written by
+svsummary.py, and the indexcov ped. Lists of files may be read from a file
+of one path per line by prefixing its name with @.
+
+    smoove_report.py --summary sites.smoove.square.summary.json --ped sites-indexcov.ped \\
+        --sequence-counts @sequence_counts.txt --variant-counts @variant_counts.txt
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+
+from collections import Counter, defaultdict
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+# parameters and workflow metadata listed under Configuration, from --run-info
+PARAMETERS = ["bams", "outdir", "fasta", "bed", "exclude", "project", "gff"]
+WORKFLOW = [("Repository", "repository"), ("Revision", "revision"), ("Launch dir", "launchDir"),
+            ("Work dir", "workDir"), ("Config files", "configFiles"), ("Container", "container"),
+            ("Container engine", "containerEngine"), ("Command line", "commandLine")]
+# carriers per site are binned into at most this many histogram bars
+max_histogram_bins = 100
+# WebGL scatter plots stay responsive with this many samples or more
+webgl_samples = 1000
+
+html = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8" />
+    <meta name="author" content="Joe Brown" />
+    <title>smoove-nf</title>
+    <link rel="stylesheet" href="https://cdn.datatables.net/1.10.19/css/dataTables.bootstrap4.min.css">
+    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.3.1/css/bootstrap.min.css">
+    <script src="https://code.jquery.com/jquery-3.3.1.js"></script>
+    <script src="https://cdn.datatables.net/1.10.19/js/jquery.dataTables.min.js"></script>
+    <script src="https://cdn.datatables.net/1.10.19/js/dataTables.bootstrap4.min.js"></script>
+    <script src="https://stackpath.bootstrapcdn.com/bootstrap/4.3.1/js/bootstrap.min.js"></script>
+    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <style type="text/css">
+    .container { max-width: 90% }
+    h1:before { height: 70px; content: ""; display:block; }
+    body { position: relative; }
+	/* fix asc/desc arrow positioning */
+	table.dataTable.table-sm .sorting:before, table.dataTable.table-sm .sorting_asc:before, table.dataTable.table-sm .sorting_desc:before { right: 1.15em; }
+    .disabled_div { pointer-events: none; opacity: 0.4; }
+    .selected { background-color: rgba(161,234,247,0.5) !important; }
+    </style>
+</head>
+<body>
+    <nav id="main_nav" class="navbar navbar-expand-md navbar-dark fixed-top bg-dark">
+        <span class="navbar-brand mb-0 h1">smoove-nf report</span>
+        <button class="navbar-toggler" type="button" data-toggle="collapse" data-target="#navbarCollapse" aria-controls="navbarCollapse" aria-expanded="false" aria-label="Toggle navigation">
+          <span class="navbar-toggler-icon"></span>
+        </button>
+        <div class="collapse navbar-collapse" id="navbarCollapse">
+          <ul class="navbar-nav mr-auto">
+                <li class="nav-item"><a class="nav-link" href="#processing">Samples</a></li>
+                <li class="nav-item"><a class="nav-link" href="#variants">Calls</a></li>
+                <li class="nav-item"><a class="nav-link" href="#coverage">Coverage</a></li>
+                <li class="nav-item"><a class="nav-link" href="#filtering">Filtering</a></li>
+                <li class="nav-item"><a class="nav-link" href="#resources">Resources</a></li>
+                <li class="nav-item"><a class="nav-link" href="#configuration">Configuration</a></li>
+            </ul>
+        </div>
+    </nav>
+
+    <div data-spy="scroll" data-target="#main_nav" data-offset="70" class="container pb-20">
+        <h1 class="border-bottom border-dark" id="processing">Summary table</h1>
+        <p>Read and variant counts are obtained as samples are processed by <a href="https://github.com/arq5x/lumpy-sv">LUMPY</a>
+           via <a href="https://github.com/brentp/smoove">smoove</a>. Samples where variants fail to be called tend
+           to have a higher number of variants suggesting issues with the sample. Failed samples are not included
+           in the merged VCF, but are genotyped and included in the annotated VCF.</p>
+		<table id="sample_table" class="table table-hover table-sm" width="100%"></table>
+        <script>
+        var report = REPORT_DATA;
+        $('body').scrollspy({ target: '#main_nav' })
+        var success = '<span class="badge badge-success">Success</span>'
+        var fail = '<span class="badge badge-danger">Fail</span>'
+        var skipped = '<span class="badge badge-secondary">Skipped</span>'
+        var status_badges = {success: success, fail: fail, skipped: skipped}
+        // per-sample data arrives as columns; DataTables wants rows
+        function to_rows(table, columns) {
+            return table[columns[0]].map(function(_, i) {
+                return columns.map(function(column) { return table[column][i] })
+            })
+        }
+        function select(values, keep) {
+            return values.filter(function(_, i) { return keep(i) })
+        }
+        var dataSet = to_rows(report.samples, ["sample", "mapped", "variants", "called", "genotyped"]);
+
+        $(document).ready(function() {
+            $('#sample_table').DataTable( {
+                data: dataSet,
+                columns: [
+                    { title: "Sample" },
+                    { title: "Reads", render: $.fn.dataTable.render.number(",")},
+                    { title: "Called Variants", render: $.fn.dataTable.render.number(",") },
+                    { title: "Called", render: function(value) { return status_badges[value] } },
+                    { title: "Genotyped", render: function(value) { return status_badges[value] } },
+                ]
+            } );
+
+            var selected_chrom = $('#chrom_selector input:radio:checked').data('name')
+            build_coverage_by_percent_plot(selected_chrom)
+            build_coverage_by_position_plot(selected_chrom)
+        } );
+        </script>
+
+        QC_SUMMARY
+
+        <h1 class="border-bottom border-dark" id="variants">SV call summary by sample</h1>
+        <h3>Deletions</h3>
+        <div class="row">
+          <div id="deletions_p1" class="col-6"></div>
+          <div id="deletions_p2" class="col-6"></div>
+        </div>
+        <h3>Duplications</h3>
+        <div class="row">
+          <div id="duplications_p1" class="col-6"></div>
+          <div id="duplications_p2" class="col-6"></div>
+        </div>
+        <h3>Inversions</h3>
+        <div class="row">
+          <div id="inversions_p1" class="col-6"></div>
+          <div id="inversions_p2" class="col-6"></div>
+        </div>
+        <h3>Break ends</h3>
+        <div class="row">
+          <div id="bnd_p1" class="col-6"></div>
+          <div id="bnd_p2" class="col-6"></div>
+        </div>
+        <script>
+        var var_samples = report.variants.sample
+        var variant_bar_layout = {
+            height: 350,
+            xaxis: {
+                title: "Sample",
+                showticklabels: false,
+				type: 'category',
+            },
+            yaxis: {
+                title: "",
+                autorange: true
+            },
+            barmode: "stack",
+            hovermode: "closest",
+            legend: {
+                orientation: "h",
+                x: 0,
+                y: 0,
+            },
+            margin: {t: 10},
+        }
+        var variant_hist_layout = {
+            height: 350,
+            xaxis: {
+                title: "",
+                showticklabels: false,
+                autorange: true
+            },
+            yaxis: {
+                title: "Count of Variants",
+                autorange: true,
+                log: true,
+                type: "log"
+            },
+            hovermode: "closest",
+            margin: {t: 10},
+        }
+        var deletions_p1_data = [
+            {
+                x: var_samples,
+                y: report.variants.small_deletions,
+                text: var_samples,
+                hoverinfo: "text+x+y+name",
+                mode: "lines",
+                type: "bar",
+                name: "small deletions"
+            },{
+                x: var_samples,
+                y: report.variants.large_deletions,
+                mode: "lines",
+                type: "bar",
+                name: "large deletions"
+            }
+        ]
+        var deletions_p2_data = [
+            {
+                // binned by the report builder
+                x: report.variants.deletions_carriers.x,
+                y: report.variants.deletions_carriers.y,
+                width: report.variants.deletions_carriers.width,
+                offset: 0,
+                type: "bar",
+                marker: {color: "#7F7F7F"}
+            }
+        ]
+        variant_bar_layout.yaxis.title = "Deletions"
+        variant_hist_layout.xaxis.title = "# of Samples with Deletions"
+        Plotly.react('deletions_p1', deletions_p1_data, variant_bar_layout)
+        Plotly.react('deletions_p2', deletions_p2_data, variant_hist_layout)
+
+        var duplications_p1_data = [
+            {
+                x: var_samples,
+                y: report.variants.small_duplications,
+                text: var_samples,
+                hoverinfo: "text+x+y+name",
+                mode: "lines",
+                type: "bar",
+                name: "small duplications"
+            },{
+                x: var_samples,
+                y: report.variants.large_duplications,
+                mode: "lines",
+                type: "bar",
+                name: "large duplications"
+            }
+        ]
+        var duplications_p2_data = [
+            {
+                // binned by the report builder
+                x: report.variants.duplications_carriers.x,
+                y: report.variants.duplications_carriers.y,
+                width: report.variants.duplications_carriers.width,
+                offset: 0,
+                type: "bar",
+                marker: {color: "#7F7F7F"}
+            }
+        ]
+        variant_bar_layout.yaxis.title = "Duplications"
+        variant_hist_layout.xaxis.title = "# of Samples with Duplications"
+        Plotly.react('duplications_p1', duplications_p1_data, variant_bar_layout)
+        Plotly.react('duplications_p2', duplications_p2_data, variant_hist_layout)
+
+        var inversions_p1_data = [
+            {
+                x: var_samples,
+                y: report.variants.small_inversions,
+                text: var_samples,
+                hoverinfo: "text+x+y+name",
+                mode: "lines",
+                type: "bar",
+                name: "small inversions"
+            },{
+                x: var_samples,
+                y: report.variants.large_inversions,
+                mode: "lines",
+                type: "bar",
+                name: "large inversions"
+            }
+        ]
+        var inversions_p2_data = [
+            {
+                // binned by the report builder
+                x: report.variants.inversions_carriers.x,
+                y: report.variants.inversions_carriers.y,
+                width: report.variants.inversions_carriers.width,
+                offset: 0,
+                type: "bar",
+                marker: {color: "#7F7F7F"}
+            }
+        ]
+        variant_bar_layout.yaxis.title = "Inversions"
+        variant_hist_layout.xaxis.title = "# of Samples with Inversions"
+        Plotly.react('inversions_p1', inversions_p1_data, variant_bar_layout)
+        Plotly.react('inversions_p2', inversions_p2_data, variant_hist_layout)
+
+        var bnd_p1_data = [
+            {
+                x: var_samples,
+                y: report.variants.small_bnds,
+                mode: "lines",
+                type: "bar",
+                name: "small BNDs",
+                text: var_samples
+            },{
+                x: var_samples,
+                y: report.variants.large_bnds,
+                mode: "lines",
+                type: "bar",
+                name: "large BNDs",
+                text: var_samples
+            },{
+                x: var_samples,
+                y: report.variants.interchromosomal_bnds,
+                mode: "lines",
+                type: "bar",
+                name: "interchromosomal BNDs",
+                text: var_samples
+            }
+        ]
+        var bnd_p2_data = [
+            {
+                // binned by the report builder
+                x: report.variants.bnds_carriers.x,
+                y: report.variants.bnds_carriers.y,
+                width: report.variants.bnds_carriers.width,
+                offset: 0,
+                type: "bar",
+                marker: {color: "#7F7F7F"}
+            }
+        ]
+        variant_bar_layout.yaxis.title = "Break Ends"
+        variant_hist_layout.xaxis.title = "# of Samples with Break Ends"
+        Plotly.react('bnd_p1', bnd_p1_data, variant_bar_layout)
+        Plotly.react('bnd_p2', bnd_p2_data, variant_hist_layout)
+        </script>
+
+        <h1 class="border-bottom border-dark" id="coverage">Sample coverage profiles</h1>
+        <div class="row pb-5">
+            <div class="col-6">
+                <h3 id="scp_inferred_sex">Inferred sex</h3>
+                By scaling coverage to a median of 1, <a href="https://github.com/brentp/goleft/tree/master/indexcov">indexcov</a> infers sex based on X and Y copy-number states. [<a href="https://github.com/brentp/goleft/blob/master/docs/indexcov/help-sex.md">docs</a>]
+            </div>
+            <div class="col-6">
+                <h3 id="scp_bin_counts">Bin counts</h3>
+                Ideally, sample depth per bin is near 1, indicating uniform coverage. Samples with a high number of low coverage bins fall to the right of the plot and samples towards the top of the plot have many regions outside of the expected coverage. [<a href="https://github.com/brentp/goleft/blob/master/docs/indexcov/help-bin.md">docs</a>]
+            </div>
+        </div>
+        <div class="row">
+            <div id="inferred_sex" class="col-6"></div>
+            <div id="bin_counts" class="col-6"></div>
+            <script>
+            var coverage = report.coverage
+            var samples = coverage.sample
+            var cn_x1 = function(i) { return coverage.sex[i] == 1 }
+            var cn_x2 = function(i) { return coverage.sex[i] != 1 }
+            var data1 = [{
+                x: select(coverage.cn_x, cn_x1),
+                y: select(coverage.cn_y, cn_x1),
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Inferred CN for X: 1',
+                text: select(samples, cn_x1),
+                hoverinfo: 'text',
+                marker: {
+                  size: 12,
+                  color: 'rgba(31,120,180,0.5)',
+                  line: {
+                      color: 'rgb(40,40,40)',
+                      width: 1,
+                  }
+                },
+            },{
+                x: select(coverage.cn_x, cn_x2),
+                y: select(coverage.cn_y, cn_x2),
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Inferred CN for X: 2',
+                text: select(samples, cn_x2),
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(227,26,28,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            var layout = {
+                title: "Inferred Sex",
+                margin: {t: 35},
+                height: 450,
+                xaxis: {title: "X Copy Number"},
+                yaxis: {title: "Y Copy Number"},
+                hovermode: "closest",
+                legend: {"orientation": "v"}
+            }
+            var plot0 = Plotly.react('inferred_sex', data1, layout)
+
+            layout.title = "Problematic low and non-uniform coverage bins"
+            layout.xaxis.title = "Proportion of bins with depth < 0.15"
+            layout.yaxis.title = "Proportion of bins with depth outside of (0.85, 1.15)"
+            data = [{
+                x: coverage.bins_lo,
+                y: coverage.bins_out,
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Bins',
+                text: samples,
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(31,120,180,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            var plot1 = Plotly.react('bin_counts', data, layout)
+            </script>
+        </div>
+
+        [PCA_DIV]
+
+        <h3>Full indexcov Results</h3>
+        <p>INDEXCOV_RESULT</p>
+
+        <h1 class="border-bottom border-dark" id="filtering">Alignment Filtering</h1>
+        <p>Split and discordant read filtering results as reported by <code>smoove call</code>.</p>
+
+        <div class="row">
+            <div id="plot_before" class="col-6"></div>
+            <div id="plot_after" class="col-6"></div>
+            <script>
+            var filter_samples = report.filtering.sample
+            var data = [{
+                x: report.filtering.split_before,
+                y: report.filtering.discordant_before,
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Before Filtering',
+                text: filter_samples,
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(31,120,180,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            var layout = {title: "Before", margin:{t: 35}, height: 450, xaxis:{title:"Split Reads"}, yaxis:{"title":"Discordant Reads"},"hovermode":"closest"}
+            var plot0 = Plotly.react('plot_before', data, layout)
+
+            data = [{
+                x: report.filtering.split_after,
+                y: report.filtering.discordant_after,
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'After Filtering',
+                text: filter_samples,
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(31,120,180,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            layout.title = "After"
+            var plot1 = Plotly.react('plot_after', data, layout)
+            </script>
+        </div>
+
+        <h1 class="border-bottom border-dark" id="resources">Resources</h1>
+        <p>Per-process usage from the Nextflow trace as of building this report. The run was still going then, so
+           the report itself and tasks that finished after the square VCF are not included.
+           CPU efficiency is CPU time over the CPUs reserved for each task's run time and memory use is peak RSS over
+           the requested memory; low values of either mean resources could be reduced. Retry hours are spent on
+           attempts that failed and were resubmitted, and queue hours are spent between submitting and starting tasks.
+           <code>bin/trace_report.py logs/trace.txt</code> reports the same from the complete trace.</p>
+        TRACE_SUMMARY
+
+        <h1 class="border-bottom border-dark" id="configuration">Configuration</h1>
+        <h3>Parameters</h3>
+        <dl class="row small">
+            PARAMETER_LIST
+        </dl>
+
+        <h3>Workflow</h3>
+        <dl class="row small">
+            WORKFLOW_LIST
+        </dl>
+
+        <h1 class="border-bottom border-dark" id="software">Software</h1>
+        <dl class="row small">
+            <dt class="col-sm-3">smoove</dt>
+            <dd class="col-sm-9">https://github.com/brentp/smoove</dd>
+            <dt class="col-sm-3">indexcov</dt>
+            <dd class="col-sm-9">https://github.com/brentp/goleft/tree/master/indexcov</dd>
+            <dt class="col-sm-3">bpbio</dt>
+            <dd class="col-sm-9">https://github.com/brentp/bpbio</dd>
+            <dt class="col-sm-3">bcftools</dt>
+            <dd class="col-sm-9">https://samtools.github.io/bcftools/</dd>
+            <dt class="col-sm-3">samtools</dt>
+            <dd class="col-sm-9">https://github.com/samtools/samtools</dd>
+            <dt class="col-sm-3">nextflow</dt>
+            <dd class="col-sm-9">https://www.nextflow.io/</dd>
+        </dl>
+    </div>
+    <footer class="footer">
+        <div class="container">
+            <p class="text-muted text-right">Generated by <a href="https://github.com/brwnj/smoove-nf">smoove-nf</a>.</p>
+        </div>
+    </footer>
+</body>
+</html>
+"""
+
+pca_div = """
+        <h3 id="scp_principal_components">Principle components</h3>
+        <p>PCA is used to summarize samples by their non-sex chromosome bins. Groups of samples may indicate major batch effects in the underlying data. [<a href="https://github.com/brentp/goleft/blob/master/docs/indexcov/help-pca.md">docs</a>]</p>
+        <div class="row">
+            <div id="pca1_2" class="col-6"></div>
+            <div id="pca1_3" class="col-6"></div>
+            <script>
+            layout.title = "PCA: 1 vs 2"
+            layout.xaxis.title = "PC1"
+            layout.yaxis.title = "PC2"
+            pca_x_series = coverage.pc1
+            data = [{
+                x: pca_x_series,
+                y: coverage.pc2,
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Bins',
+                text: samples,
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(31,120,180,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            var plot2 = Plotly.react('pca1_2', data, layout)
+
+            layout.title = "PCA: 1 vs 3"
+            layout.xaxis.title = "PC1"
+            layout.yaxis.title = "PC3"
+            data = [{
+                x: pca_x_series,
+                y: coverage.pc3,
+                mode: 'markers',
+                type: report.scatter_type,
+                name: 'Bins',
+                text: samples,
+                hoverinfo: 'text',
+                marker: {
+                    size: 12,
+                    color: 'rgba(31,120,180,0.5)',
+                    line: {
+                        color: 'rgb(40,40,40)',
+                        width: 1,
+                    }
+                },
+            }]
+            var plot3 = Plotly.react('pca1_3', data, layout)
+            </script>
+        </div>
+"""
+
+def render(template, values):
+    """Fills every placeholder of the template in a single pass."""
+    pattern = re.compile("|".join(re.escape(k) for k in sorted(values, key=len, reverse=True)))
+    return pattern.sub(lambda m: values[m.group(0)], template)
+
+
+def columns(records, names):
+    """Columnar dict of lists from a list of dicts."""
+    return dict((name, [r.get(name) for r in records]) for name in names)
+
+
+def parse_sequence_count(count_file):
+    """Total aligned reads from a smoove call log."""
+    with open(count_file) as fh:
+        # [smoove]: ([E]lumpy-filter) 2019/01/16 21:45:01 [lumpy_filter] extracted splits and discordants from 701835557 total aligned reads
+        for line in fh:
+            if "total aligned reads" in line:
+                return int(line.partition("from ")[-1].partition(" total")[0])
+    return None
+
+
+def parse_variant_count(count_file):
+    """Number of records from bcftools stats."""
+    with open(count_file) as fh:
+        for line in fh:
+            if line.startswith("#"):
+                continue
+            if "number of records" in line:
+                return int(line.split("\t")[-1])
+    return None
+
+
+def cache_key(parser, path):
+    # staged inputs are links into the directories that wrote them
+    st = os.stat(path)
+    return "%s\t%s\t%d\t%d" % (parser.__name__, os.path.realpath(path), st.st_size, int(st.st_mtime))
+
+
+def parse_all(parser, paths, previous, parsed, pool):
+    """Parses files across the pool, reusing results of the previous report.
+    Results of this report are added to `parsed`.
+    """
+    keys = [cache_key(parser, path) for path in paths]
+    todo = [(key, path) for key, path in zip(keys, paths) if key not in previous]
+    if todo:
+        logging.info("Parsing %d of %d files with %s" % (len(todo), len(paths), parser.__name__))
+        for (key, _), value in zip(todo, pool.map(parser, [path for _, path in todo], chunksize=64)):
+            parsed[key] = value
+    for key in keys:
+        if key not in parsed:
+            parsed[key] = previous[key]
+    return [parsed[key] for key in keys]
+
+
+def definitions(items):
+    """Rows of a Bootstrap definition list from (term, value) pairs."""
+    return "\n            ".join('<dt class="col-sm-3">{}</dt>\n            <dd class="col-sm-9">{}</dd>'.format(
+        term, "" if value is None else str(value).replace("&", "&amp;").replace("<", "&lt;")) for term, value in items)
+
+
+def histogram(counts, max_value):
+    """Bins a Counter of value -> sites into at most max_histogram_bins
+    bins of equal width over [0, max_value], dropping empty bins.
+    """
+    width = max(1, -(-(max_value + 1) // max_histogram_bins))
+    bins = Counter()
+    for value, sites in counts.items():
+        bins[value // width * width] += sites
+    x = sorted(bins)
+    return dict(x=x, y=[bins[i] for i in x], width=width)
+
+
+def main(args):
+    sequence_count_files = [i for i in args.sequence_counts if i]
+    variant_count_files = [i for i in args.variant_counts if i]
+    qc_files = [i for i in args.qc if i]
+    sex_chroms = args.sexchroms.split(",")
+    run_info = {}
+    if args.run_info:
+        with open(args.run_info) as fh:
+            run_info = json.load(fh)
+
+    previous_cache = {}
+    if args.previous_cache and os.path.exists(args.previous_cache) and os.path.getsize(args.previous_cache) > 0:
+        with open(args.previous_cache) as fh:
+            previous_cache = json.load(fh)
+    # only files of this report are carried forward
+    parse_cache = {}
+
+    # building the sample summary table
+    sample_counts = defaultdict(dict)
+    pool = multiprocessing.Pool(args.cpus)
+    ## parse counts
+    for count_file, count in zip(sequence_count_files, parse_all(parse_sequence_count, sequence_count_files, previous_cache, parse_cache, pool)):
+        sample = os.path.basename(count_file).partition("-smoove-call")[0]
+        if count is None:
+            logging.error("Counts could not be parsed for sample %s from counts file %s" % (sample, count_file))
+            continue
+        sample_counts[sample]["mapped"] = count
+        sample_counts[sample]["variants"] = -1
+        # initialize the status messages
+        sample_counts[sample]["called"] = "fail"
+        sample_counts[sample]["genotyped"] = "fail"
+    ## parse called
+    for count_file, count in zip(variant_count_files, parse_all(parse_variant_count, variant_count_files, previous_cache, parse_cache, pool)):
+        sample = os.path.basename(count_file).partition("-stats")[0]
+        if count is not None:
+            sample_counts[sample]["variants"] = count
+            sample_counts[sample]["called"] = "success"
+    pool.close()
+    with open(args.cache, "w") as fh:
+        json.dump(parse_cache, fh, separators=(",", ":"))
+    ## genotyped samples from the annotated vcf's header, as summarized by svsummary.py
+    with open(args.summary) as fh:
+        summary = json.load(fh)
+    for sample in summary["genotyped"]:
+        sample_counts[sample]["genotyped"] = "success"
+        if args.calls_skipped:
+            sample_counts[sample].update(mapped=None, variants=None, called="skipped")
+    # building the read filtering plots
+    filtering = []
+    for sample, (split_before, disc_before, split_after, disc_after) in summary["count_stats"].items():
+        filtering.append(dict(sample=sample, split_before=split_before, discordant_before=disc_before,
+                              split_after=split_after, discordant_after=disc_after))
+
+    logging.info("Compiling sample stats for data table...")
+    samples = []
+    for sample in sorted(sample_counts.keys()):
+        counts = sample_counts[sample]
+        samples.append(dict(sample=sample, mapped=counts.get("mapped"), variants=counts.get("variants"),
+                            called=counts.get("called", "fail"), genotyped=counts.get("genotyped", "fail")))
+
+    # building sequence summary plots
+    coverage = []
+    pca = True
+    with open(args.ped) as fh:
+        reader = csv.DictReader(fh, delimiter="\t")
+        for row in reader:
+            total = float(row["bins.in"]) + float(row["bins.out"])
+            record = dict(sample=row["sample_id"],
+                          # inferred sex
+                          sex=int(row["sex"]) if row["sex"] in ("1", "2") else 0,
+                          cn_x=float(row["CN%s" % sex_chroms[0]]),
+                          cn_y=float(row["CN%s" % sex_chroms[1]]) if len(sex_chroms) > 1 else 0,
+                          # bin plot
+                          bins_lo=float(row["bins.lo"]) / total,
+                          bins_out=float(row["bins.out"]) / total)
+            # PCAs
+            try:
+                record.update(pc1=float(row["PC1"]), pc2=float(row["PC2"]), pc3=float(row["PC3"]))
+            except KeyError:
+                pca = False
+            coverage.append(record)
+
+    # fixing the file link to indexcov results
+    output_dir = args.outdir.rstrip("/")
+    index_cov_output = "{dir}/indexcov/index.html".format(dir=output_dir).replace("s3://", "https://s3.amazonaws.com/")
+
+    # build the variant summary plots
+    logging.info("Summarizing variants from %s" % args.summary)
+    variants = dict(sample=summary["samples"])
+    for group in ["deletions", "duplications", "inversions", "bnds"]:
+        for size in ["small", "large"] + (["interchromosomal"] if group == "bnds" else []):
+            name = "%s_%s" % (size, group)
+            variants[name] = summary["counts"][name]
+        site_carriers = Counter(dict((int(k), v) for k, v in summary["carriers"][group].items()))
+        variants["%s_carriers" % group] = histogram(site_carriers, len(summary["samples"]))
+
+    report = dict(
+        samples=columns(samples, ["sample", "mapped", "variants", "called", "genotyped"]),
+        filtering=columns(filtering, ["sample", "split_before", "discordant_before", "split_after", "discordant_after"]),
+        coverage=columns(coverage, ["sample", "sex", "cn_x", "cn_y", "bins_lo", "bins_out"] + (["pc1", "pc2", "pc3"] if pca else [])),
+        variants=variants,
+        scatter_type="scattergl" if len(samples) >= webgl_samples else "scatter",
+    )
+
+    # samples removed before calling
+    qc_summary = ""
+    for qc_file in qc_files:
+        with open(qc_file) as fh:
+            failed = [row for row in csv.DictReader(fh, delimiter="\t") if row["status"] == "fail"]
+        qc_summary = """
+            <h3>Failed QC</h3>
+            <p>{count} samples failed the header, end of file, and index checks or the indexcov bin limits of <code>--qcmaxlo</code>
+               and <code>--qcmaxout</code> and were not called or genotyped.</p>
+            """.format(count=len(failed))
+        if failed:
+            qc_summary += '<table class="table table-hover table-sm small"><thead><tr><th>Sample</th><th>Reasons</th></tr></thead><tbody>'
+            qc_summary += "".join("<tr><td>{}</td><td>{}</td></tr>".format(row["sample"], row["reasons"].replace("<", "&lt;"))
+                                  for row in failed)
+            qc_summary += "</tbody></table>"
+
+    # resource usage from the trace, when there is one
+    trace_summary = ""
+    if args.trace_html:
+        with open(args.trace_html) as fh:
+            trace_summary = fh.read().strip()
+
+    with open(args.output, "w") as fh:
+        print(render(html, {
+            # compact and safe to embed within a script element
+            "REPORT_DATA": json.dumps(report, separators=(",", ":")).replace("</", "<\\/"),
+            "[PCA_DIV]": pca_div if pca else "",
+            "INDEXCOV_RESULT": '<a href="{path}">{path}</a>'.format(path=index_cov_output),
+            "TRACE_SUMMARY": trace_summary or "<p>No trace was available.</p>",
+            "QC_SUMMARY": qc_summary,
+            "PARAMETER_LIST": definitions(("<code>--%s</code>" % p, run_info.get(p)) for p in PARAMETERS),
+            "WORKFLOW_LIST": definitions((term, run_info.get(key)) for term, key in WORKFLOW),
+        }), file=fh)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                fromfile_prefix_chars="@")
+    p.add_argument("--summary", required=True, help="square VCF summary written by svsummary.py")
+    p.add_argument("--ped", required=True, help="indexcov ped, or the ped merged with --ped")
+    p.add_argument("--sequence-counts", nargs="*", default=[], help="<sample>-smoove-call.log files")
+    p.add_argument("--variant-counts", nargs="*", default=[], help="<sample>-stats.txt files of bcftools stats")
+    p.add_argument("--qc", nargs="*", default=[], help="qc.tsv written with --qc")
+    p.add_argument("--trace-html", help="resource usage table written by trace_report.py --html")
+    p.add_argument("--run-info", help="JSON of the parameters and workflow metadata listed under Configuration")
+    p.add_argument("--sexchroms", default="X,Y")
+    p.add_argument("--calls-skipped", action="store_true", help="samples were genotyped at --sites without calling")
+    p.add_argument("--outdir", default="./results", help="output directory linked from the report")
+    p.add_argument("--previous-cache", help="parsed counts of the previous report, keyed by file path, size, and mtime")
+    p.add_argument("--cache", default="report.cache.json", help="parsed counts of this report")
+    p.add_argument("--cpus", type=int, default=1, help="processes parsing the per-sample files")
+    p.add_argument("--output", default="smoove-nf.html")
+    main(p.parse_args())
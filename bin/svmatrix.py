@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Read the genotype matrix written by smoove-nf's --matrix stage without
+parsing the square VCF. Arrays are memory-mapped, so slicing a range of
+sites or samples reads only those bytes.
+
+    from svmatrix import SVMatrix
+    m = SVMatrix("results/smoove/matrix/sites.matrix")
+    first, last = m.region("chr1", 1000000, 2000000)
+    gts = m.genotypes[first:last, m.sample_slice("S1", "S9")]
+    dhffc = m.field("DHFFC")[first:last]
+
+    svmatrix.py results/smoove/matrix/sites.matrix
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+class SVMatrix(object):
+    """Sites by samples arrays of a square VCF.
+
+    `genotypes` holds the count of non-reference alleles (-1 is missing),
+    `field(name)` the float32 FORMAT values (NaN is missing), and `sites`
+    the chrom, pos, end, svlen, and svtype of each site, with chrom and
+    svtype as indexes into `chroms` and `svtypes`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as fh:
+            self.meta = json.load(fh)
+        self.samples = self.meta["samples"]
+        self.chroms = self.meta["chroms"]
+        self.svtypes = self.meta["svtypes"]
+        self.fields = self.meta["fields"]
+        self._sample_index = dict((s, i) for i, s in enumerate(self.samples))
+        self._arrays = {}
+
+    def array(self, name):
+        """Read-only memory map of one array."""
+        if name not in self._arrays:
+            spec = self.meta["arrays"][name]
+            dtype = np.dtype(spec["dtype"]).newbyteorder("<" if self.meta["byteorder"] == "little" else ">")
+            shape = tuple(spec["shape"])
+            if 0 in shape:
+                self._arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                self._arrays[name] = np.memmap(os.path.join(self.path, "%s.bin" % name), dtype=dtype, mode="r",
+                                               shape=shape)
+        return self._arrays[name]
+
+    @property
+    def genotypes(self):
+        return self.array("genotypes")
+
+    def field(self, name):
+        if name not in self.fields:
+            raise KeyError("%s was not exported; available fields: %s" % (name, ", ".join(self.fields)))
+        return self.array(name)
+
+    @property
+    def sites(self):
+        return dict((c, self.array(c)) for c in ("chrom", "pos", "end", "svlen", "svtype"))
+
+    def sample_indexes(self, samples):
+        """Column of each sample. Indexing with a list copies the columns."""
+        return [self._sample_index[s] for s in samples]
+
+    def sample_slice(self, first, last):
+        """Columns from sample `first` through `last`, as a zero-copy slice."""
+        return slice(self._sample_index[first], self._sample_index[last] + 1)
+
+    def region(self, chrom, start, end):
+        """Range of rows of sites starting within [start, end] on chrom."""
+        if chrom not in self.chroms:
+            return 0, 0
+        code = self.chroms.index(chrom)
+        # chromosomes are numbered in file order, so codes are sorted
+        chrom_codes = self.array("chrom")
+        lo = int(np.searchsorted(chrom_codes, code, side="left"))
+        hi = int(np.searchsorted(chrom_codes, code, side="right"))
+        positions = self.array("pos")[lo:hi]
+        return (lo + int(np.searchsorted(positions, start, side="left")),
+                lo + int(np.searchsorted(positions, end, side="right")))
+
+
+def main(args):
+    m = SVMatrix(args.matrix)
+    print("%d sites by %d samples" % m.genotypes.shape)
+    print("fields: %s" % ", ".join(m.fields))
+    svtypes = m.array("svtype")
+    for i, svtype in enumerate(m.svtypes):
+        print("%s\t%d" % (svtype, int((svtypes == i).sum())))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("matrix", help="directory written by the --matrix stage")
+    main(p.parse_args())
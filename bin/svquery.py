@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Interval index of the SVs in a square VCF for overlap queries by region
+and sample. The index is a SQLite database holding an R*Tree of each
+site's span, from POS to END, and of break end mate positions, so large
+DEL, DUP, and INV are found from any position they cover.
+
+    svquery.py build sites.smoove.square.anno.vcf.gz sites.svindex.sqlite
+    svquery.py query sites.svindex.sqlite chr1:1000000-2000000
+    svquery.py query sites.svindex.sqlite --bed genes.bed --samples S1,S2 --svtype DEL
+"""
+from __future__ import print_function
+
+import argparse
+import gzip
+import re
+import sqlite3
+import sys
+
+
+SCHEMA = """
+CREATE TABLE samples (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE chroms (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE sites (id INTEGER PRIMARY KEY, vcf_id TEXT, chrom INTEGER, start INTEGER, end INTEGER,
+                    svtype TEXT, svlen INTEGER, mate_chrom INTEGER, mate_pos INTEGER);
+CREATE TABLE carriers (site INTEGER, sample INTEGER, alts INTEGER, PRIMARY KEY (site, sample)) WITHOUT ROWID;
+CREATE VIRTUAL TABLE spans USING rtree(id, chrom_lo, chrom_hi, start, end);
+CREATE VIRTUAL TABLE mates USING rtree(id, chrom_lo, chrom_hi, start, end);
+"""
+# the R*Tree stores 32 bit floats, so its hits are candidates for the exact
+# comparisons against the sites table
+OVERLAP = """
+SELECT s.id FROM spans r JOIN sites s ON s.id = r.id
+WHERE r.chrom_lo <= :chrom AND r.chrom_hi >= :chrom AND r.start <= :end AND r.end >= :start
+  AND s.chrom = :chrom AND s.start <= :end AND s.end >= :start
+UNION
+SELECT s.id FROM mates r JOIN sites s ON s.id = r.id
+WHERE r.chrom_lo <= :chrom AND r.chrom_hi >= :chrom AND r.start <= :end AND r.end >= :start
+  AND s.mate_chrom = :chrom AND s.mate_pos BETWEEN :start AND :end
+"""
+MATE = re.compile(r"[\[\]]([^\[\]]+):(\d+)[\[\]]")
+
+
+def info_value(info, key):
+    for field in info.split(";"):
+        k, _, v = field.partition("=")
+        if k == key:
+            return v
+    return None
+
+
+def alt_count(gt, decoded={}):
+    """Non-reference alleles of a GT."""
+    if gt not in decoded:
+        decoded[gt] = sum(1 for a in gt.replace("|", "/").split("/") if a not in ("0", "."))
+    return decoded[gt]
+
+
+def build(vcf, path, batch=10000):
+    """Writes the index of a square VCF to path."""
+    db = sqlite3.connect(path)
+    db.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+    chroms = {}
+
+    def chrom_id(name):
+        if name not in chroms:
+            chroms[name] = len(chroms)
+            db.execute("INSERT INTO chroms VALUES (?, ?)", (chroms[name], name))
+        return chroms[name]
+
+    sites, spans, mates, carriers = [], [], [], []
+
+    def flush():
+        db.executemany("INSERT INTO sites VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", sites)
+        db.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?)", spans)
+        db.executemany("INSERT INTO mates VALUES (?, ?, ?, ?, ?)", mates)
+        db.executemany("INSERT INTO carriers VALUES (?, ?, ?)", carriers)
+        for rows in (sites, spans, mates, carriers):
+            del rows[:]
+
+    site = 0
+    with gzip.open(vcf, "rt") if vcf.endswith(".gz") else open(vcf) as fh:
+        for line in fh:
+            if line.startswith("##"):
+                continue
+            if line.startswith("#"):
+                samples = line.rstrip("\n").split("\t")[9:]
+                db.executemany("INSERT INTO samples VALUES (?, ?)", enumerate(samples))
+                continue
+            toks = line.rstrip("\n").split("\t")
+            chrom, start, info = chrom_id(toks[0]), int(toks[1]), toks[7]
+            svtype = info_value(info, "SVTYPE") or "."
+            end = info_value(info, "END")
+            end = max(start, int(end)) if end and svtype != "BND" else start
+            svlen = info_value(info, "SVLEN")
+            mate_chrom = mate_pos = None
+            mate = MATE.search(toks[4]) if svtype == "BND" else None
+            if mate:
+                mate_chrom, mate_pos = chrom_id(mate.group(1)), int(mate.group(2))
+                mates.append((site, mate_chrom, mate_chrom, mate_pos, mate_pos))
+            sites.append((site, toks[2], chrom, start, end, svtype, abs(int(svlen)) if svlen else None, mate_chrom,
+                          mate_pos))
+            spans.append((site, chrom, chrom, start, end))
+            gt = toks[8].split(":").index("GT") if "GT" in toks[8].split(":") else None
+            if gt is not None:
+                for sample, column in enumerate(toks[9:]):
+                    alts = alt_count(column.split(":", gt + 1)[gt])
+                    if alts:
+                        carriers.append((site, sample, alts))
+            site += 1
+            if len(sites) >= batch:
+                flush()
+    flush()
+    db.execute("CREATE INDEX carriers_sample ON carriers (sample, site)")
+    db.commit()
+    db.close()
+    return site
+
+
+class SVIndex(object):
+    """Overlap and sample queries of an index written by `build`."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.chroms = dict((name, i) for i, name in self.db.execute("SELECT id, name FROM chroms"))
+        self.chrom_names = dict((i, name) for name, i in self.chroms.items())
+        self.samples = dict((name, i) for i, name in self.db.execute("SELECT id, name FROM samples"))
+        self.sample_names = dict((i, name) for name, i in self.samples.items())
+
+    def query(self, chrom, start, end, samples=None, svtypes=None):
+        """Sites with a span or mate within [start, end] (1-based, inclusive)
+        on chrom as dicts. With samples, only sites carried by one of them
+        are returned and only their carriers are listed.
+        """
+        if chrom not in self.chroms:
+            return []
+        sample_ids = None
+        if samples:
+            missing = [s for s in samples if s not in self.samples]
+            if missing:
+                raise KeyError("samples not in the index: %s" % ", ".join(missing))
+            sample_ids = set(self.samples[s] for s in samples)
+        results = []
+        ids = [i for i, in self.db.execute(OVERLAP, dict(chrom=self.chroms[chrom], start=start, end=end))]
+        for site_id in sorted(ids):
+            row = self.db.execute("SELECT vcf_id, chrom, start, end, svtype, svlen, mate_chrom, mate_pos "
+                                  "FROM sites WHERE id = ?", (site_id,)).fetchone()
+            if svtypes and row[4] not in svtypes:
+                continue
+            carriers = [(self.sample_names[sample], alts) for sample, alts in
+                        self.db.execute("SELECT sample, alts FROM carriers WHERE site = ?", (site_id,))
+                        if sample_ids is None or sample in sample_ids]
+            if sample_ids is not None and not carriers:
+                continue
+            results.append(dict(id=row[0], chrom=self.chrom_names[row[1]], start=row[2], end=row[3], svtype=row[4],
+                                svlen=row[5], mate_chrom=self.chrom_names.get(row[6]), mate_pos=row[7],
+                                carriers=carriers))
+        return results
+
+
+def parse_region(region):
+    """chrom:start-end (1-based, inclusive) or chrom."""
+    chrom, _, span = region.rpartition(":")
+    if not chrom or not re.match(r"^[\d,]+-[\d,]+$", span):
+        return region, 1, 2 ** 31 - 1
+    start, end = span.replace(",", "").split("-")
+    return chrom, int(start), int(end)
+
+
+def read_bed(path):
+    with gzip.open(path, "rt") if path.endswith(".gz") else open(path) as fh:
+        for line in fh:
+            if line.startswith(("#", "track", "browser")) or not line.strip():
+                continue
+            toks = line.rstrip("\n").split("\t")
+            name = toks[3] if len(toks) > 3 else "%s:%s-%s" % tuple(toks[:3])
+            # BED is 0-based and half open
+            yield name, toks[0], int(toks[1]) + 1, int(toks[2])
+
+
+def main_build(args):
+    sites = build(args.vcf, args.index)
+    print("indexed %d sites" % sites, file=sys.stderr)
+
+
+def main_query(args):
+    index = SVIndex(args.index)
+    queries = [(r, ) + parse_region(r) for r in args.regions]
+    if args.bed:
+        queries.extend(read_bed(args.bed))
+    samples = args.samples.split(",") if args.samples else None
+    svtypes = set(args.svtype.split(",")) if args.svtype else None
+    print("query", "chrom", "start", "end", "id", "svtype", "svlen", "mate", "carriers", sep="\t")
+    for name, chrom, start, end in queries:
+        for site in index.query(chrom, start, end, samples=samples, svtypes=svtypes):
+            mate = "%s:%d" % (site["mate_chrom"], site["mate_pos"]) if site["mate_pos"] is not None else "."
+            carriers = ",".join("%s:%d" % c for c in site["carriers"]) or "."
+            print(name, site["chrom"], site["start"], site["end"], site["id"], site["svtype"],
+                  "." if site["svlen"] is None else site["svlen"], mate, carriers, sep="\t")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = p.add_subparsers(dest="command")
+    b = sub.add_parser("build", help="index a square VCF")
+    b.add_argument("vcf")
+    b.add_argument("index")
+    b.set_defaults(func=main_build)
+    q = sub.add_parser("query", help="sites overlapping regions, as tab delimited text")
+    q.add_argument("index")
+    q.add_argument("regions", nargs="*", help="chrom:start-end (1-based, inclusive) or chrom")
+    q.add_argument("--bed", help="query each interval of this BED, named by its fourth column")
+    q.add_argument("--samples", help="comma delimited samples; only sites they carry are reported")
+    q.add_argument("--svtype", help="comma delimited SV types to report, e.g. DEL,DUP")
+    q.set_defaults(func=main_query)
+    args = p.parse_args()
+    if not getattr(args, "func", None):
+        p.error("a command is required")
+    args.func(args)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Per-sample SV counts by type and size and the number of carriers of each
+site of a square VCF, written as JSON for the workflow report. `tee` copies
+a VCF stream from stdin to stdout unchanged while it is summarized, so the
+summary comes from the same pass that compresses the VCF.
+Summaries of regions of one square VCF are combined with `merge`.
+
+    smoove annotate ... | svsummary.py tee sites.summary.json | bgzip -c > sites.vcf.gz
+    svsummary.py merge sites.summary.json region-*.summary.json
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import re
+import sys
+
+from collections import Counter, defaultdict
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+GROUPS = ["deletions", "duplications", "inversions", "bnds"]
+SVTYPES = {b"DEL": "deletions", b"DUP": "duplications", b"INV": "inversions", b"BND": "bnds"}
+MATE = re.compile(br"[\[\]]([^\[\]]+):(\d+)[\[\]]")
+
+
+def size_classes(group):
+    return ["small", "large"] + (["interchromosomal"] if group == "bnds" else [])
+
+
+def info_value(info, key):
+    for field in info.split(b";"):
+        k, _, v = field.partition(b"=")
+        if k == key:
+            return v
+    return None
+
+
+def sv_class(toks, large_sv_length):
+    """Plot group and size class of a record, e.g. ("deletions", "large")."""
+    info = toks[7]
+    group = SVTYPES.get(info_value(info, b"SVTYPE"))
+    if group is None:
+        return None, None
+    if group == "bnds":
+        # the mate position is within the ALT, e.g. N[chr2:1234[
+        mate = MATE.search(toks[4])
+        if mate is None:
+            return group, "small"
+        if mate.group(1) != toks[0]:
+            return group, "interchromosomal"
+        length = abs(int(mate.group(2)) - int(toks[1]))
+    else:
+        svlen = info_value(info, b"SVLEN")
+        end = info_value(info, b"END")
+        length = abs(int(svlen)) if svlen else (int(end) - int(toks[1]) if end else 0)
+    return group, "large" if length >= large_sv_length else "small"
+
+
+def carriers_numpy(genotypes):
+    """Carrier status of every sample from the sample columns of a record,
+    decoded from the bytes of all samples at once. smoove writes GT first.
+    """
+    buf = np.frombuffer(b"\t" + genotypes.rstrip(b"\n") + b"::", dtype=np.uint8)
+    # each sample's GT begins after a tab: allele, separator, allele
+    starts = np.flatnonzero(buf == 9)
+    first = buf[starts + 1]
+    separator = buf[starts + 2]
+    second = buf[starts + 3]
+    is_alt = lambda a: (a >= ord("1")) & (a <= ord("9"))
+    diploid = (separator == ord("/")) | (separator == ord("|"))
+    return is_alt(first) | (diploid & is_alt(second))
+
+
+def carriers_python(genotypes, decoded={}):
+    """Pure python fallback of carriers_numpy; distinct GTs are decoded once."""
+    status = []
+    for sample in genotypes.rstrip(b"\n").split(b"\t"):
+        gt = sample.partition(b":")[0]
+        if gt not in decoded:
+            decoded[gt] = any(a not in (b"0", b".") for a in re.split(b"[/|]", gt))
+        status.append(decoded[gt])
+    return status
+
+
+def summarize(lines, large_sv_length=1000, out=None):
+    """Summary of the VCF lines (bytes), each written to `out` when given.
+
+    Along with the counts, the samples smoove genotyped (its ##SAMPLE header
+    lines) and its read filtering counts (##smoove_count_stats) are kept so
+    the report does not need to reopen the VCF.
+    """
+    carriers = carriers_numpy if np is not None else carriers_python
+    samples = []
+    genotyped = []
+    count_stats = {}
+    sample_counts = {}
+    site_carriers = defaultdict(Counter)
+    for line in lines:
+        if out is not None:
+            out.write(line)
+        if line.startswith(b"##"):
+            if line.startswith(b"##SAMPLE"):
+                genotyped.append(line.strip().partition(b"ID=")[-1].strip(b">").decode())
+            elif line.startswith(b"##smoove_count_stats"):
+                sample, _, stats = line.strip().partition(b"=")[-1].partition(b":")
+                count_stats[sample.decode()] = [int(i) for i in stats.split(b",")]
+            continue
+        if line.startswith(b"#"):
+            samples = [i.decode() for i in line.rstrip(b"\n").split(b"\t")[9:]]
+            continue
+        toks = line.split(b"\t", 9)
+        if len(toks) < 10:
+            continue
+        group, size = sv_class(toks, large_sv_length)
+        if group is None:
+            continue
+        status = carriers(toks[9])
+        name = "%s_%s" % (size, group)
+        if name not in sample_counts:
+            sample_counts[name] = np.zeros(len(samples), dtype=np.int64) if np is not None else [0] * len(samples)
+        if np is not None:
+            sample_counts[name] += status
+            site_carriers[group][int(status.sum())] += 1
+        else:
+            counts = sample_counts[name]
+            for i, carrier in enumerate(status):
+                if carrier:
+                    counts[i] += 1
+            site_carriers[group][sum(status)] += 1
+    counts = {}
+    for group in GROUPS:
+        for size in size_classes(group):
+            name = "%s_%s" % (size, group)
+            counts[name] = [int(i) for i in sample_counts.get(name, [0] * len(samples))]
+    return dict(samples=samples, genotyped=genotyped, count_stats=count_stats, large_sv_length=large_sv_length,
+                counts=counts,
+                # carriers -> sites; JSON keys are strings
+                carriers=dict((g, dict((str(k), v) for k, v in site_carriers[g].items())) for g in GROUPS))
+
+
+def merge(summaries):
+    """Sums the counts of summaries of regions of one square VCF. Header
+    derived values are taken from the first, as bcftools concat does.
+    """
+    merged = summaries[0]
+    for summary in summaries[1:]:
+        if summary["samples"] != merged["samples"]:
+            raise ValueError("summaries of different samples cannot be merged")
+        for name, counts in summary["counts"].items():
+            merged["counts"][name] = [a + b for a, b in zip(merged["counts"][name], counts)]
+        for group, sites in summary["carriers"].items():
+            total = Counter(merged["carriers"][group])
+            total.update(sites)
+            merged["carriers"][group] = dict(total)
+    return merged
+
+
+def main_tee(args):
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
+    stdout = getattr(sys.stdout, "buffer", sys.stdout)
+    summary = summarize(stdin, args.large, stdout)
+    stdout.flush()
+    with open(args.json, "w") as fh:
+        json.dump(summary, fh, separators=(",", ":"))
+    print("summarized %d samples" % len(summary["samples"]), file=sys.stderr)
+
+
+def main_merge(args):
+    summaries = []
+    for path in args.summaries:
+        with open(path) as fh:
+            summaries.append(json.load(fh))
+    with open(args.json, "w") as fh:
+        json.dump(merge(summaries), fh, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = p.add_subparsers(dest="command")
+    t = sub.add_parser("tee", help="summarize a VCF from stdin while copying it to stdout")
+    t.add_argument("json")
+    t.add_argument("--large", type=int, default=1000,
+                   help="SVs and same chromosome break ends spanning at least this many bases are large")
+    t.set_defaults(func=main_tee)
+    m = sub.add_parser("merge", help="combine the summaries of regions of one square VCF")
+    m.add_argument("json")
+    m.add_argument("summaries", nargs="+")
+    m.set_defaults(func=main_merge)
+    args = p.parse_args()
+    if not getattr(args, "func", None):
+        p.error("a command is required")
+    args.func(args)
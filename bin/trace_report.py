@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+Summarize a Nextflow trace (logs/trace.txt) into per-process efficiency
+and the critical path through the workflow's barriers.
+
+    trace_report.py results/logs/trace.txt
+    trace_report.py --html results/logs/trace.txt > trace.html
+
+The workflow report summarizes the trace while the run is still going, with
+--partial, so its critical path is labeled as stopping at the last finished
+task rather than the end of the run.
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+
+from collections import OrderedDict
+
+from nftrace import read_trace
+
+
+# processes between barriers; a stage cannot finish before the previous
+# stage has, so stage ends trace the critical path
+STAGES = OrderedDict([
+    ("prepare", ["prepare_ref_cache", "prepare_regions", "plan_call_groups"]),
+    ("call", ["smoove_call", "gather_calls"]),
+    ("merge", ["smoove_merge", "smoove_merge_batch", "smoove_merge_group", "smoove_merge_tree", "find_new_sites",
+               "update_sites", "restrict_sites"]),
+    ("genotype", ["plan_genotype_shards", "smoove_genotype", "gather_genotypes"]),
+    ("square", ["smoove_square", "square_paste_batch", "plan_square_regions", "square_region", "square_concat"]),
+])
+
+
+def summarize_processes(rows):
+    """Per-process totals of tasks, CPU, memory, retries, and queueing."""
+    summary = OrderedDict()
+    for row in rows:
+        s = summary.setdefault(row["process"], dict(tasks=0, failed=0, retry_hours=0.0, cpu_used=0.0,
+                                                    cpu_reserved=0.0, rss_peak=0.0, memory=0.0,
+                                                    memory_ratios=[], queue_hours=0.0, run_hours=0.0))
+        realtime = row.get("realtime") or 0.0
+        s["tasks"] += 1
+        if row.get("status") in ("FAILED", "ABORTED"):
+            # time spent on attempts that had to be rerun
+            s["failed"] += 1
+            s["retry_hours"] += realtime / 3600
+        s["run_hours"] += realtime / 3600
+        if row.get("submit") and row.get("start"):
+            s["queue_hours"] += max(0.0, row["start"] - row["submit"]) / 3600
+        cpus = row.get("cpus") if isinstance(row.get("cpus"), int) else 1
+        if row.get("%cpu") is not None:
+            s["cpu_used"] += row["%cpu"] * realtime
+            s["cpu_reserved"] += cpus * realtime
+        if row.get("peak_rss"):
+            s["rss_peak"] = max(s["rss_peak"], row["peak_rss"])
+            if row.get("memory"):
+                s["memory"] = max(s["memory"], row["memory"])
+                s["memory_ratios"].append(row["peak_rss"] / row["memory"])
+    return summary
+
+
+def critical_path(rows, partial=False):
+    """(stage, hours, straggler) for each stage in the order they finish.
+    Tasks after the last stage are counted as the report stage, unless the
+    trace is partial and they have not all run yet.
+    """
+    starts = [r["submit"] for r in rows if r.get("submit")]
+    if not starts:
+        return []
+    previous_end = min(starts)
+    path = []
+    for stage, processes in STAGES.items():
+        tasks = [r for r in rows if r["process"] in processes and r.get("complete")]
+        if not tasks:
+            continue
+        last = max(tasks, key=lambda r: r["complete"])
+        end = max(previous_end, last["complete"])
+        path.append((stage, (end - previous_end) / 3600, last.get("name", last["process"])))
+        previous_end = end
+    tasks = [r for r in rows if r.get("complete")]
+    if tasks and not partial:
+        last = max(tasks, key=lambda r: r["complete"])
+        if last["complete"] > previous_end:
+            path.append(("report", (last["complete"] - previous_end) / 3600, last.get("name", last["process"])))
+    return path
+
+
+def table(rows):
+    """Rows of display values for the process summary."""
+    out = []
+    for process, s in summarize_processes(rows).items():
+        efficiency = s["cpu_used"] / s["cpu_reserved"] if s["cpu_reserved"] else None
+        memory_use = sum(s["memory_ratios"]) / len(s["memory_ratios"]) if s["memory_ratios"] else None
+        queue = s["queue_hours"] / s["run_hours"] if s["run_hours"] else None
+        out.append([
+            process,
+            "%d" % s["tasks"],
+            "%d" % s["failed"],
+            "%.1f" % s["retry_hours"],
+            "%.0f%%" % (100 * efficiency) if efficiency is not None else "-",
+            "%.1f GB" % (s["rss_peak"] / 1024 ** 3) if s["rss_peak"] else "-",
+            "%.1f GB" % (s["memory"] / 1024 ** 3) if s["memory"] else "-",
+            "%.0f%%" % (100 * memory_use) if memory_use is not None else "-",
+            "%.1f" % s["queue_hours"],
+            "%.1f" % s["run_hours"],
+            "%.2f" % queue if queue is not None else "-",
+        ])
+    return out
+
+
+HEADER = ["Process", "Tasks", "Failed", "Retry hours", "CPU efficiency", "Peak RSS", "Requested memory",
+          "Mean memory use", "Queue hours", "Run hours", "Queue / run"]
+
+
+def write_text(rows, fh, partial=False):
+    print("\t".join(HEADER), file=fh)
+    for values in table(rows):
+        print("\t".join(values), file=fh)
+    print("", file=fh)
+    if partial:
+        print("# partial: tasks that had not finished when the trace was read are missing", file=fh)
+    print("stage\thours\tlast task", file=fh)
+    for stage, hours, task in critical_path(rows, partial):
+        print("%s\t%.2f\t%s" % (stage, hours, task), file=fh)
+
+
+def write_html(rows, fh, partial=False):
+    print('<table class="table table-hover table-sm small">', file=fh)
+    print("<thead><tr>%s</tr></thead><tbody>" % "".join("<th>%s</th>" % h for h in HEADER), file=fh)
+    for values in table(rows):
+        print("<tr>%s</tr>" % "".join("<td>%s</td>" % v for v in values), file=fh)
+    print("</tbody></table>", file=fh)
+    print("<h3>Critical path%s</h3>" % (" (partial)" if partial else ""), file=fh)
+    print("<p>Wall time between the ends of consecutive stages, each of which waits on the one before it, "
+          "and the task that finished each stage last.</p>", file=fh)
+    if partial:
+        print('<p class="text-danger">This is a partial path, read from the trace while the run was still going. '
+              "Tasks that finished after the square VCF, such as this report, plots, and somalier, are missing, "
+              "so the run took longer than shown. Run <code>bin/trace_report.py logs/trace.txt</code> after the "
+              "run for the complete path.</p>", file=fh)
+    print('<table class="table table-hover table-sm small">', file=fh)
+    print("<thead><tr><th>Stage</th><th>Hours</th><th>Last task</th></tr></thead><tbody>", file=fh)
+    for stage, hours, task in critical_path(rows, partial):
+        print("<tr><td>%s</td><td>%.2f</td><td>%s</td></tr>" % (stage, hours, task), file=fh)
+    print("</tbody></table>", file=fh)
+
+
+def main(args):
+    rows = read_trace(args.trace)
+    if args.html:
+        write_html(rows, sys.stdout, args.partial)
+    else:
+        write_text(rows, sys.stdout, args.partial)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("trace", help="trace.txt written by Nextflow")
+    p.add_argument("--html", action="store_true", help="write an HTML fragment rather than text")
+    p.add_argument("--partial", action="store_true", help="the run is still going; label the critical path as partial")
+    main(p.parse_args())
@@ -33,6 +33,52 @@ if (params.help) {
                           used to infer sex. Default: 'X,Y'
     --sensitive           Preserves more variants from being filtered
                           throughout the workflow. Default: false
+    --callgroups          Call each sample over this many chromosome groups,
+                          balanced by length, then gather per sample.
+                          Default: false
+    --mergebatch          Merge calls in parallel batches of this many
+                          samples, then merge the batches as a tree.
+                          Default: false
+    --mergefanin          Number of batch site sets merged by each group
+                          merge ahead of the final merge. Default: 8
+    --genotypeshards      Genotype each sample over this many shards of the
+                          merged sites, balanced by site count, then gather
+                          per sample. Default: false
+    --squarebatch         Paste genotyped samples in batches of this many,
+                          then join and annotate the batches by region in
+                          parallel. Default: false
+    --squareshards        Number of regions used with --squarebatch.
+                          Default: 32
+    --regions             BED of regions to restrict calling, genotyping,
+                          and coverage profiling to. Default: false
+    --sites               Genotype every sample at this sites VCF, e.g. a
+                          prior cohort's sites.vcf.gz, skipping `smoove call`
+                          and `smoove merge`. Default: false
+    --previous            Output directory of a previous run to extend.
+                          Samples it genotyped are genotyped only at new
+                          sites and every other sample is called as usual.
+                          Default: false
+    --refcache            Existing CRAM reference MD5 cache directory
+                          (REF_PATH layout %2s/%2s/%s). When unset, the
+                          cache is built once from --fasta. Default: false
+    --matrix              Export genotypes and --matrixfields of the square
+                          VCF as memory-mappable arrays, read with
+                          bin/svmatrix.py. Default: false
+    --matrixfields        Comma delimited FORMAT fields exported with
+                          --matrix. Default: 'DHFFC,DHBFC,SQ'
+    --svindex             Index the square VCF for region and sample queries
+                          with bin/svquery.py. Default: false
+    --qc                  Before calling, drop truncated or unindexed
+                          samples or those with more than --qcmaxlo low
+                          coverage or --qcmaxout non-uniform indexcov bins.
+                          Default: false
+    --qcmaxlo             Proportion of bins with depth < 0.15 allowed
+                          with --qc. Default: 0.2
+    --qcmaxout            Proportion of bins with depth outside of
+                          (0.85, 1.15) allowed with --qc. Default: 0.5
+    --indexcovbatch       Run indexcov over batches of this many indexes in
+                          parallel, then combine the batches and recompute
+                          principal components. Default: false
 
     covviz options:
     ---------------
@@ -49,6 +95,11 @@ if (params.help) {
     --minsamples          Show all traces when analyzing this few samples;
                           ignores z-threshold, distance-threshold, and
                           slop. Default: 8
+    --covvizbins          Bins per chromosome plotted by covviz, chosen to
+                          keep the shape of every sample. Default: 5000
+    --samplesheets        Comma delimited sample sheets joined with --ped
+                          onto the indexcov ped by --samplecol as covviz
+                          metadata. Default: false
 
     somalier options:
     -----------------
@@ -58,6 +109,14 @@ if (params.help) {
                           https://github.com/brentp/somalier/releases
                           Default: false
     --ped                 Sample relationship definitions. Default: false
+    --somalierpack        Run `somalier extract` on this many samples per
+                          task, concurrently within the task's cpus.
+                          Default: false
+    --fused               Run `somalier extract` within `smoove call` so
+                          each alignment is staged once for both. Requires
+                          --fusedcontainer. Default: false
+    --fusedcontainer      Container providing both smoove and somalier.
+                          Default: false
 
     -----------------------------------------------------------------------
     """.stripIndent()
@@ -76,10 +135,16 @@ if( !params.gff ) { exit 1, "--gff is not defined" }
 // somalier
 params.knownsites = false
 params.ped = false
+params.fused = false
+params.fusedcontainer = false
 
 // variables
 params.sensitive = false
 params.bed = false
+params.refcache = false
+params.previous = false
+params.sites = false
+params.regions = false
 project = params.project ?: 'sites'
 sexchroms = params.sexchroms ?: 'X,Y'
 sexchroms = sexchroms.replaceAll(" ", "")
@@ -105,7 +170,49 @@ if (params.knownsites) {
 if (params.ped) {
     log.info("Pedigree file      (--ped)           : ${params.ped}")
 }
+if (params.samplesheets) {
+    log.info("Sample sheets      (--samplesheets)  : ${params.samplesheets}")
+}
+if (params.fused) {
+    log.info("Fused extract      (--fused)         : ${params.fusedcontainer}")
+}
 log.info("Sensitive          (--sensitive)     : ${params.sensitive}")
+if (params.callgroups) {
+    log.info("Call groups        (--callgroups)    : ${params.callgroups}")
+}
+if (params.mergebatch) {
+    log.info("Merge batch size   (--mergebatch)    : ${params.mergebatch}")
+    log.info("Merge fan-in       (--mergefanin)    : ${params.mergefanin}")
+}
+if (params.genotypeshards) {
+    log.info("Genotype shards    (--genotypeshards): ${params.genotypeshards}")
+}
+if (params.squarebatch) {
+    log.info("Square batch size  (--squarebatch)   : ${params.squarebatch}")
+    log.info("Square regions     (--squareshards)  : ${params.squareshards}")
+}
+if (params.qc) {
+    log.info("QC bins.lo limit   (--qcmaxlo)       : ${params.qcmaxlo}")
+    log.info("QC bins.out limit  (--qcmaxout)      : ${params.qcmaxout}")
+}
+if (params.indexcovbatch) {
+    log.info("indexcov batch size(--indexcovbatch): ${params.indexcovbatch}")
+}
+if (params.regions) {
+    log.info("Regions            (--regions)       : ${params.regions}")
+}
+if (params.sites) {
+    log.info("Genotyped sites    (--sites)         : ${params.sites}")
+}
+if (params.previous) {
+    log.info("Previous run       (--previous)      : ${params.previous}")
+}
+if (params.refcache) {
+    log.info("Reference cache    (--refcache)      : ${params.refcache}")
+}
+if (params.matrix) {
+    log.info("Matrix fields      (--matrixfields)  : ${params.matrixfields}")
+}
 log.info("Output             (--outdir)        : ${outdir}")
 log.info("\n")
 
@@ -132,6 +239,17 @@ if (params.ped) {
         exit 1, "Missing optional ped file: ${custom_ped}"
     }
 }
+// sample metadata joined onto the indexcov ped for covviz
+sample_sheets = params.ped ? [custom_ped] : []
+if (params.samplesheets) {
+    params.samplesheets.toString().tokenize(",").each { path ->
+        def sheet = file(path.trim())
+        if (!sheet.exists()) {
+            exit 1, "Missing optional sample sheet: ${sheet}"
+        }
+        sample_sheets << sheet
+    }
+}
 
 // check file existence
 if (!fasta.exists()) {
@@ -146,65 +264,642 @@ if (params.bed && !bed.exists()) {
 if (!gff.exists()) {
     exit 1, "Missing annotations: ${gff}"
 }
+if (params.fused && !params.fusedcontainer) {
+    exit 1, "--fused requires --fusedcontainer with both smoove and somalier"
+}
+if (params.mergebatch && params.mergefanin < 2) {
+    exit 1, "--mergefanin must be at least 2"
+}
+if (params.refcache && !file(params.refcache).exists()) {
+    exit 1, "Missing reference cache: ${params.refcache}"
+}
+
+if (params.regions && !file(params.regions).exists()) {
+    exit 1, "Missing regions: ${params.regions}"
+}
+if (params.sites && !file(params.sites).exists()) {
+    exit 1, "Missing sites: ${params.sites}"
+}
+if (params.sites && params.previous) {
+    exit 1, "--sites and --previous cannot be combined"
+}
+
+// samples genotyped by a previous run are not called again and are only
+// genotyped at sites that run did not already have
+previous_samples = []
+previous_sites = false
+if (params.previous) {
+    previous_sites = file("${params.previous}/smoove/merged/${project}.sites.vcf.gz")
+    if (!previous_sites.exists()) {
+        exit 1, "Missing previous sites: ${previous_sites}"
+    }
+    previous_samples = files("${params.previous}/smoove/genotyped/*-smoove.genotyped.vcf.gz").collect { it.name - '-smoove.genotyped.vcf.gz' }
+    // every previous sample needs its alignments to be genotyped at new sites
+    missing = previous_samples - files(params.bams).collect { it.baseName }
+    if (missing) {
+        exit 1, "Missing alignments for previously genotyped samples: ${missing.join(', ')}"
+    }
+    // without new samples nothing is called and there are no sites to add
+    if (!(files(params.bams).collect { it.baseName } - previous_samples)) {
+        exit 1, "Every sample of --bams was genotyped by --previous; there are no new samples to add"
+    }
+    log.info("Previously genotyped samples         : ${previous_samples.size()}")
+}
+
+// stages that collect many files are cached by their paths and sizes plus a
+// fingerprint of their contents: the size, mtime, and a hash of the first and
+// last blocks of each file. Fingerprints are kept in the outdir between runs
+// so a resume only reads files that changed.
+fingerprint_file = file("${outdir}/logs/fingerprints.tsv")
+fingerprints = Collections.synchronizedMap([:])
+used_fingerprints = Collections.synchronizedMap([:])
+if (fingerprint_file.exists()) {
+    fingerprint_file.eachLine { line ->
+        def toks = line.split('\t')
+        if (toks.size() == 2) {
+            fingerprints[toks[0]] = toks[1]
+        }
+    }
+}
+
+def block_hash(path, long block = 65536) {
+    def md5 = java.security.MessageDigest.getInstance("MD5")
+    def channel = java.nio.file.Files.newByteChannel(path)
+    try {
+        def size = channel.size()
+        [0L, Math.max(0L, size - block)].unique().each { offset ->
+            def buffer = java.nio.ByteBuffer.allocate((int) Math.min(block, size - offset))
+            channel.position(offset)
+            while (buffer.hasRemaining() && channel.read(buffer) > 0) {}
+            buffer.flip()
+            md5.update(buffer)
+        }
+    } finally {
+        channel.close()
+    }
+    return md5.digest().encodeHex().toString()
+}
+
+def fingerprint_files(files) {
+    def md5 = java.security.MessageDigest.getInstance("MD5")
+    files.flatten().sort { it.toString() }.each { path ->
+        def key = "${path.toUriString()}:${path.size()}:${path.lastModified()}"
+        if (!fingerprints.containsKey(key)) {
+            fingerprints[key] = block_hash(path)
+        }
+        used_fingerprints[key] = fingerprints[key]
+        md5.update("${path.size()}:${fingerprints[key]}".bytes)
+    }
+    return md5.digest().encodeHex().toString()
+}
+
+// end of file markers of BGZF (BAM) and CRAM 3
+bgzf_eof = [0x1f, 0x8b, 0x08, 0x04, 0, 0, 0, 0, 0, 0xff, 0x06, 0, 0x42, 0x43, 0x02, 0, 0x1b, 0, 0x03, 0, 0, 0, 0, 0,
+            0, 0, 0, 0].collect { it as byte } as byte[]
+cram_eof = [0x0f, 0, 0, 0, 0xff, 0xff, 0xff, 0xff, 0x0f, 0xe0, 0x45, 0x4f, 0x46, 0, 0, 0, 0, 0x01, 0, 0x05, 0xbd,
+            0xd9, 0x4f, 0, 0x01, 0, 0x06, 0x06, 0x01, 0, 0x01, 0, 0x01, 0, 0xee, 0x63, 0x01, 0x4b].collect { it as byte } as byte[]
+
+// the checks of `samtools quickcheck`, a readable header and an end of file
+// marker, on the first block and the last bytes of an alignment file. Only
+// those are read, so the alignments are not staged for QC. Returns the
+// reason it fails or null
+def quickcheck(path, index) {
+    if (!index.exists()) {
+        return "no index ${index.name}"
+    }
+    def channel = java.nio.file.Files.newByteChannel(path)
+    try {
+        def read = { long offset, int length ->
+            def buffer = java.nio.ByteBuffer.allocate((int) Math.min(length, Math.max(0L, channel.size() - offset)))
+            channel.position(offset)
+            while (buffer.hasRemaining() && channel.read(buffer) > 0) {}
+            return buffer.array()
+        }
+        def head = read(0L, 65536)
+        def eof = bgzf_eof
+        if (path.name.endsWith('.cram')) {
+            if (head.size() < 5 || new String(head, 0, 4, 'US-ASCII') != 'CRAM') {
+                return "not a CRAM file"
+            }
+            // CRAM 2 has no end of file container
+            if (head[4] < 3) {
+                return null
+            }
+            eof = cram_eof
+        } else {
+            def magic = new byte[4]
+            try {
+                new DataInputStream(new java.util.zip.GZIPInputStream(new ByteArrayInputStream(head))).readFully(magic)
+            } catch (IOException e) {
+                return "not a BGZF file"
+            }
+            if (new String(magic, 'US-ASCII') != 'BAM\u0001') {
+                return "not a BAM file"
+            }
+        }
+        if (channel.size() < eof.size() || !Arrays.equals(read(channel.size() - eof.size(), eof.size()), eof)) {
+            return "no end of file marker, the file may be truncated"
+        }
+    } finally {
+        channel.close()
+    }
+    return null
+}
+
+// the resource model of nextflow.config: <base> + <per_gb> * GB of input +
+// <per_file> * input files, scaled by the attempt and capped. Input bytes
+// stand in for site counts, as every genotyped VCF holds one record per
+// site, and the number of files is the batch size
+def model_inputs(files) {
+    files = [files].flatten()
+    return [files.sum { it.size() } / 1e9, files.size()]
+}
+
+def model_value(model, resource, files, attempt) {
+    def coefficients = params.resources
+    def (gb, nfiles) = model_inputs(files)
+    def value = coefficients.get("${model}_${resource}".toString()) +
+        (coefficients.get("${model}_${resource}_per_gb".toString()) ?: 0) * gb +
+        (coefficients.get("${model}_${resource}_per_file".toString()) ?: 0) * nfiles
+    return Math.min(value * attempt, coefficients.get("max_${resource}".toString()))
+}
+
+def model_memory(model, files, attempt) {
+    return "${Math.ceil(model_value(model, 'memory', files, attempt) * 1024) as long} MB"
+}
+
+def model_time(model, files, attempt) {
+    return "${Math.ceil(model_value(model, 'time', files, attempt) * 60) as long}m"
+}
+
+// the model inputs of a task, recorded in the trace for bin/fit_resources.py
+def input_tag(label, files) {
+    files = [files].flatten()
+    return "${label} input_bytes=${files.sum { it.size() } as long} files=${files.size()}"
+}
+
+// batches are named by their first file, e.g. "S1-smoove and 99 more"
+def batch_label(files) {
+    files = [files].flatten()
+    return "${files.collect { it.simpleName }.min()} and ${files.size() - 1} more"
+}
+
+// smoove paste joins samples line by line, so every sample must hold the same
+// records in the same order. Samples gathered from shards or from a previous
+// run's genotypes are sorted apart from the sites, and records sharing a
+// position may land in a different order; pasting them would misalign
+// genotypes, so the task stops instead
+def record_order_check(files) {
+    return """
+    for f in $files; do
+        bcftools query -f '%CHROM\\t%POS\\t%ID\\t%REF\\t%ALT\\n' \$f | md5sum | sed "s|-|\$f|"
+    done > record-order.txt
+    if [ \$(cut -d' ' -f1 record-order.txt | sort -u | wc -l) -gt 1 ]; then
+        echo "ERROR: samples differ in their records or record order and cannot be pasted:" >&2
+        cat record-order.txt >&2
+        exit 1
+    fi
+    """
+}
+
+workflow.onComplete {
+    fingerprint_file.parent.mkdirs()
+    fingerprint_file.text = used_fingerprints.collect { key, value -> "${key}\t${value}\n" }.join()
+}
 
 
 Channel
     .fromPath(params.bams, checkIfExists: true)
     .map { file -> tuple(file.baseName, file, file + ("${file}".endsWith('.cram') ? '.crai' : '.bai')) }
-    .into { call_bams; genotype_bams; somalier_bams }
+    .into { input_bams; qc_bams }
 
 Channel
     .fromPath(indexes, checkIfExists: true)
     .set { index_ch }
 
 Channel
-    .fromPath(params.bams)
-    .map { params.sensitive ? "KEEP" : "FALSE" }
+    .fromPath("${params.previous}/smoove/genotyped/*-smoove.genotyped.vcf.gz")
+    .map { file -> tuple(file.name - '-smoove.genotyped.vcf.gz', 2, file, file + '.csi') }
+    .filter { params.previous }
+    .set { previous_genotyped }
+
+Channel
+    .value(params.sensitive ? "KEEP" : "FALSE")
     .into { sensitive_call_ch; sensitive_genotype_ch }
 
 
+// the MD5 keyed reference cache is built once per run and shared by every
+// task that may need to decode CRAM
+process prepare_ref_cache {
+    input:
+    file fasta
+    file faidx
+
+    output:
+    file("ref_cache") into built_ref_cache
+
+    when: params.refcache == false
+
+    script:
+    """
+    seq_cache_populate.pl -root ref_cache $fasta
+    """
+}
+
+(params.refcache ? Channel.value(file(params.refcache)) : built_ref_cache)
+    .into { call_ref_cache; genotype_ref_cache; somalier_ref_cache }
+
+
+process prepare_regions {
+    input:
+    file regions from Channel.value(params.regions ? file(params.regions) : [])
+    file faidx
+
+    output:
+    file("regions") into prepared_regions
+
+    when: params.regions
+
+    script:
+    template 'prepare_regions.py'
+}
+
+(params.regions ? prepared_regions : Channel.value(false))
+    .into { call_regions; restrict_regions; indexcov_regions; indexcov_batch_regions }
+
+
+process plan_call_groups {
+    input:
+    file faidx
+
+    output:
+    file("group-*.exclude") into call_groups
+
+    when: params.callgroups
+
+    script:
+    ngroups = params.callgroups
+    exclude = params.exclude ?: ""
+    template 'plan_chrom_groups.py'
+}
+
+
+// each group calls only its chromosomes by excluding all others. The number
+// of groups goes along so each sample is gathered once its groups are done
+(params.callgroups
+    ? call_groups.flatMap { groups -> [groups].flatten().collect { tuple(it.baseName, it.text.trim(), [groups].flatten().size()) } }
+    : Channel.value(["", params.exclude ?: "", 1]))
+    .set { call_groups_ch }
+
+
+(index_batch_ch, index_flat_ch) = (params.indexcovbatch ? [index_ch, Channel.empty()] : [Channel.empty(), index_ch])
+
+
+process run_indexcov {
+    publishDir path: "$outdir/reports/indexcov", mode: "copy"
+    tag { input_tag(project, idx) }
+    memory { model_memory('indexcov', idx, task.attempt) }
+    time { model_time('indexcov', idx, task.attempt) }
+
+    input:
+    set file(idx), val(fingerprint) from index_flat_ch.collect().map { [it, fingerprint_files(it)] }
+    file regions from indexcov_regions
+    file faidx
+
+    output:
+    file("${project}*.png")
+    file("*.html")
+    file("${project}*.bed.gz") into flat_bed_ch
+    file("${project}*.ped") into flat_indexcov_ped_ch
+    file("${project}*.roc") into flat_roc_ch
+
+    when: !params.indexcovbatch
+
+    script:
+    excludepatt = params.exclude ? "--excludepatt \"${params.exclude}\"" : ""
+    // limit coverage to the chromosomes that hold --regions, along with --exclude
+    if( params.regions ) {
+        def userpatt = params.exclude ? "(${params.exclude})|" : ""
+        excludepatt = "--excludepatt \"${userpatt}(\$(cat $regions/excludepatt))\""
+    }
+    """
+    goleft indexcov --sex $sexchroms $excludepatt --directory $project --fai $faidx $idx
+    mv $project/* .
+    """
+}
+
+
+process run_indexcov_batch {
+    publishDir path: "$outdir/reports/indexcov/batch-${task.index}", mode: "copy", pattern: "*.{png,html}"
+    tag { input_tag(batch_label(idx), idx) }
+    memory { model_memory('indexcov', idx, task.attempt) }
+    time { model_time('indexcov', idx, task.attempt) }
+
+    input:
+    file idx from index_batch_ch.collate(params.indexcovbatch ?: 1)
+    file regions from indexcov_batch_regions
+    file faidx
+
+    output:
+    file("batch-*.png")
+    file("*.html")
+    file("batch-*.bed.gz") into batch_bed_ch
+    file("batch-*.ped") into batch_ped_ch
+    file("batch-*.roc") into batch_roc_ch
+
+    when: params.indexcovbatch
+
+    script:
+    excludepatt = params.exclude ? "--excludepatt \"${params.exclude}\"" : ""
+    if( params.regions ) {
+        def userpatt = params.exclude ? "(${params.exclude})|" : ""
+        excludepatt = "--excludepatt \"${userpatt}(\$(cat $regions/excludepatt))\""
+    }
+    """
+    goleft indexcov --sex $sexchroms $excludepatt --directory batch-${task.index} --fai $faidx $idx
+    mv batch-${task.index}/* .
+    """
+}
+
+
+process combine_indexcov {
+    publishDir path: "$outdir/reports/indexcov", mode: "copy"
+    label 'covviz'
+    tag { input_tag(project, bed) }
+    memory { model_memory('combine_indexcov', bed, task.attempt) }
+    time { model_time('combine_indexcov', bed, task.attempt) }
+
+    input:
+    file bed from batch_bed_ch.collect()
+    file ped from batch_ped_ch.collect()
+    file roc from batch_roc_ch.collect()
+    file faidx
+
+    output:
+    file("${project}-indexcov.bed.gz") into tree_bed_ch
+    file("${project}-indexcov.ped") into tree_indexcov_ped_ch
+    file("${project}-indexcov.roc") into tree_roc_ch
+
+    script:
+    template 'combine_indexcov.py'
+}
+
+
+flat_bed_ch.mix(tree_bed_ch).set { bed_ch }
+flat_indexcov_ped_ch.mix(tree_indexcov_ped_ch).into { indexcov_ped_ch; qc_ped_ch }
+flat_roc_ch.mix(tree_roc_ch).set { roc_ch }
+
+
+qc_bams
+    .filter { params.qc }
+    .map { sample, bam, bai -> "${sample}\t${quickcheck(bam, bai) ?: 'pass'}" }
+    .collectFile(name: 'quickcheck.tsv', newLine: true)
+    .set { quickcheck_ch }
+
+
+process qc_gate {
+    publishDir path: "$outdir/logs", mode: "copy"
+
+    input:
+    file quickcheck from quickcheck_ch
+    file ped from qc_ped_ch
+
+    output:
+    file("qc.tsv") into qc_results
+
+    when: params.qc
+
+    script:
+    template 'qc_gate.py'
+}
+
+
+qc_results.into { qc_split; qc_report }
+qc_split
+    .splitCsv(header: true, sep: '\t')
+    .filter { it.status == 'pass' }
+    .map { [it.sample] }
+    .set { qc_pass }
+
+// samples failing --qc are not called, genotyped, or fingerprinted
+(params.qc ? input_bams.join(qc_pass) : input_bams)
+    .into { call_bams; genotype_bams; somalier_bams }
+
+
+// nothing is called when genotyping a fixed set of sites
+call_bams
+    .filter { !params.sites && !(it[0] in previous_samples) }
+    .combine(call_groups_ch)
+    .map { sample, bam, bai, group, excludechroms, ngroups ->
+        tuple(sample, group ? "${sample}.${group}" : sample, bam, bai, excludechroms, ngroups)
+    }
+    .set { call_ch }
+
+
 process smoove_call {
-    publishDir path: "$outdir/smoove/called", mode: "copy", pattern: "*.vcf.gz*"
-    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-stats.txt"
-    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-smoove-call.log"
+    publishDir path: "$outdir/smoove/called", mode: "copy", pattern: "*.vcf.gz*", enabled: !params.callgroups
+    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-stats.txt", enabled: !params.callgroups
+    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-smoove-call.log", enabled: !params.callgroups
+    publishDir path: "$outdir/somalier/extract", mode: "copy", pattern: "*.somalier"
+    tag { input_tag(name, bam) }
+    memory { model_memory('call', bam, task.attempt) }
+    time { model_time('call', bam, task.attempt) }
 
     input:
     env SMOOVE_KEEP_ALL from sensitive_call_ch
-    set sample, file(bam), file(bai) from call_bams
+    set sample, name, file(bam), file(bai), excludechroms, ngroups from call_ch
+    file ref_cache from call_ref_cache
+    file regions from call_regions
+    file knownsites_file
     file fasta
     file faidx
     file bed
 
     output:
-    file("${sample}-smoove.genotyped.vcf.gz") into vcfs
-    file("${sample}-smoove.genotyped.vcf.gz.csi") into idxs
-    file("${sample}-stats.txt") into variant_counts
-    file("${sample}-smoove-call.log") into sequence_counts
+    set sample, ngroups, file("${name}-smoove.genotyped.vcf.gz"), file("${name}-smoove.genotyped.vcf.gz.csi"), file("${name}-smoove-call.log") into called_parts
+    file("${name}-stats.txt") optional true into called_stats
+    file("*.somalier") optional true into fused_somalier_counts
 
     script:
-    def excludechroms = params.exclude ? "--excludechroms \"${params.exclude}\"" : ""
+    def excludeopt = excludechroms ? "--excludechroms \"${excludechroms}\"" : ""
     def filters = params.sensitive ? "--noextrafilters" : ""
     def excluderegions = params.bed ? "--exclude $bed" : ""
+    // chromosome groups are summarized once gathered
+    def stats = params.callgroups ? "" : "bcftools stats ${name}-smoove.genotyped.vcf.gz > ${name}-stats.txt"
+    // only reads within --regions are extracted and everything else is excluded
+    def alignments = bam
+    def extract = ""
+    if( params.regions ) {
+        alignments = "${name}.regions.bam"
+        excluderegions = "--exclude exclude.bed"
+        extract = """
+        samtools view -b -M -L $regions/regions.bed -T $fasta -o $alignments $bam
+        samtools index $alignments
+        zcat -f ${params.bed ? bed : ''} $regions/exclude.bed > exclude.bed
+        """
+    }
+    // somalier reads the alignments already staged for calling, once per sample
+    def somalier = ""
+    if( params.fused && params.knownsites && (!params.callgroups || name.endsWith(".group-0001")) ) {
+        somalier = "somalier extract --out-dir ./ --fasta $fasta --sites $knownsites_file $bam"
+    }
+    """
+    export REF_PATH=\$(pwd)/$ref_cache/%2s/%2s/%s
+    export REF_CACHE=xx
+    $extract
+    $somalier
+    smoove call --genotype --name $name --processes ${task.cpus} \
+        --fasta $fasta $excluderegions $excludeopt $filters \
+        $alignments 2> >(tee -a ${name}-smoove-call.log >&2)
+    $stats
+    """
+}
+
+
+(gather_calls_ch, called_whole) = (params.callgroups ? [called_parts, Channel.empty()] : [Channel.empty(), called_parts])
+
+
+process gather_calls {
+    publishDir path: "$outdir/smoove/called", mode: "copy", pattern: "*.vcf.gz*"
+    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-stats.txt"
+    publishDir path: "$outdir/logs", mode: "copy", pattern: "*-smoove-call.log"
+
+    input:
+    set sample, file(vcf), file(idx), file(calllog) from gather_calls_ch
+        .map { sample, ngroups, vcf, idx, calllog -> tuple(groupKey(sample, ngroups), vcf, idx, calllog) }
+        .groupTuple()
+
+    output:
+    set sample, file("${sample}-smoove.genotyped.vcf.gz"), file("${sample}-smoove.genotyped.vcf.gz.csi"), file("${sample}-smoove-call.log") into called_gathered
+    file("${sample}-stats.txt") into gathered_stats
+
+    script:
+    groups = [vcf].flatten().collect { it.name }.sort().join(" ")
+    logs = [calllog].flatten().collect { it.name }.sort().join(" ")
+    // every group's lumpy_filter pass reads the whole alignment file, so
+    // the groups agree on the read count rather than adding up to it
     """
-    smoove call --genotype --name $sample --processes ${task.cpus} \
-        --fasta $fasta $excluderegions $excludechroms $filters \
-        $bam 2> >(tee -a ${sample}-smoove-call.log >&2)
+    bcftools concat --allow-overlaps -O u $groups \
+        | bcftools sort -O z -o ${sample}-smoove.genotyped.vcf.gz
+    bcftools index ${sample}-smoove.genotyped.vcf.gz
     bcftools stats ${sample}-smoove.genotyped.vcf.gz > ${sample}-stats.txt
+
+    reads=\$(awk '/total aligned reads/ { for (i = 1; i < NF; i++) if (\$i == "from" && \$(i + 1) > max) max = \$(i + 1) } END { print max + 0 }' $logs)
+    echo "[smoove-nf] extracted splits and discordants from \$reads total aligned reads" > ${sample}-smoove-call.log
+    for log in $logs; do
+        echo "[smoove-nf] \$log"
+        cat \$log
+    done >> ${sample}-smoove-call.log
     """
 }
 
 
+called_whole
+    .map { sample, ngroups, vcf, idx, calllog -> tuple(sample, vcf, idx, calllog) }
+    .mix(called_gathered.map { sample, vcf, idx, calllog -> tuple(sample.toString(), vcf, idx, calllog) })
+    .into { called_merge; called_logs }
+called_logs
+    .map { it[3] }
+    .mix(Channel.fromPath("${params.previous}/logs/*-smoove-call.log").filter { params.previous })
+    .set { sequence_counts }
+called_stats
+    .mix(gathered_stats)
+    .mix(Channel.fromPath("${params.previous}/logs/*-stats.txt").filter { params.previous })
+    .set { variant_counts }
+
+(merge_batch_ch, merge_flat_ch) = (params.mergebatch ? [called_merge, Channel.empty()] : [Channel.empty(), called_merge])
+merge_flat_ch.into { vcfs; idxs }
+
+
 process smoove_merge {
-    // publishDir path: "$outdir/smoove/merged", mode: "copy"
+    publishDir path: "$outdir/smoove/merged", mode: "copy", enabled: !params.previous && !params.regions
+    tag { input_tag(project, vcf) }
+    memory { model_memory('merge', vcf, task.attempt) }
+    time { model_time('merge', vcf, task.attempt) }
+
+    input:
+    set file(vcf), val(fingerprint) from vcfs.map { it[1] }.collect().map { [it, fingerprint_files(it)] }
+    file idx from idxs.map { it[2] }.collect()
+    file fasta
+    file faidx
+
+    output:
+    file("${project}.sites.vcf.gz") into flat_sites
+
+    when: !params.mergebatch
+
+    script:
+    """
+    smoove merge --name $project --fasta $fasta $vcf
+    """
+}
+
+
+process smoove_merge_batch {
+    tag { input_tag(batch_label(vcf), vcf) }
+    memory { model_memory('merge', vcf, task.attempt) }
+    time { model_time('merge', vcf, task.attempt) }
 
     input:
-    file vcf from vcfs.collect()
-    file idx from idxs.collect()
+    set file(vcf), file(idx) from merge_batch_ch.map { [it[1], it[2]] }.collate(params.mergebatch ?: 1).map { it.transpose() }
     file fasta
     file faidx
 
     output:
-    file("${project}.sites.vcf.gz") into sites
+    file("batch-*.sites.vcf.gz") into batch_sites
+
+    when: params.mergebatch
+
+    script:
+    """
+    smoove merge --name batch-${task.index} --fasta $fasta $vcf
+    """
+}
+
+
+// batch site sets are merged --mergefanin at a time, each group as its own
+// task, and then the groups are merged once
+process smoove_merge_group {
+    tag { input_tag(batch_label(vcf), vcf) }
+    memory { model_memory('merge', vcf, task.attempt) }
+    time { model_time('merge', vcf, task.attempt) }
+
+    input:
+    file vcf from batch_sites.collate(params.mergefanin ?: 1)
+    file fasta
+    file faidx
+
+    output:
+    file("group-*.sites.vcf.gz") into group_sites
+
+    when: params.mergebatch
+
+    script:
+    merge = "smoove merge --name group-${task.index} --fasta $fasta $vcf"
+    if( [vcf].flatten().size() < 2 ) {
+        merge = "cp $vcf group-${task.index}.sites.vcf.gz"
+    }
+    """
+    $merge
+    """
+}
+
+
+process smoove_merge_tree {
+    publishDir path: "$outdir/smoove/merged", mode: "copy", enabled: !params.previous && !params.regions
+    tag { input_tag(project, vcf) }
+    memory { model_memory('merge', vcf, task.attempt) }
+    time { model_time('merge', vcf, task.attempt) }
+
+    input:
+    set file(vcf), val(fingerprint) from group_sites.collect().map { [it, fingerprint_files(it)] }
+    file fasta
+    file faidx
+
+    output:
+    file("${project}.sites.vcf.gz") into tree_sites
+
+    when: params.mergebatch
 
     script:
     """
@@ -213,88 +908,403 @@ process smoove_merge {
 }
 
 
+flat_sites
+    .mix(tree_sites)
+    .mix(params.sites ? Channel.value(file(params.sites)) : Channel.empty())
+    .set { all_sites }
+
+(restrict_ch, unrestricted_sites) = (params.regions ? [all_sites, Channel.empty()] : [Channel.empty(), all_sites])
+
+
+process restrict_sites {
+    publishDir path: "$outdir/smoove/merged", mode: "copy", enabled: !params.previous
+
+    input:
+    file 'unrestricted.sites.vcf.gz' from restrict_ch
+    file regions from restrict_regions
+
+    output:
+    file("${project}.sites.vcf.gz") into restricted_sites
+
+    script:
+    """
+    bcftools view -T $regions/regions.bed -O z -o ${project}.sites.vcf.gz unrestricted.sites.vcf.gz
+    """
+}
+
+
+unrestricted_sites
+    .mix(restricted_sites)
+    .set { sites_ch }
+
+(candidate_sites, merged_sites) = (params.previous ? [sites_ch, Channel.empty()] : [Channel.empty(), sites_ch])
+
+
+process find_new_sites {
+    input:
+    file 'candidate.sites.vcf.gz' from candidate_sites
+    file 'previous.sites.vcf.gz' from previous_sites
+
+    output:
+    file("new.sites.vcf") into found_sites
+
+    when: params.previous
+
+    script:
+    template 'new_sites.py'
+}
+
+
+process update_sites {
+    publishDir path: "$outdir/smoove/merged", mode: "copy"
+
+    input:
+    file new_sites from found_sites
+    file 'previous.sites.vcf.gz' from previous_sites
+
+    output:
+    file("${project}.sites.vcf.gz") into updated_sites
+    file("${project}.new.sites.vcf.gz") into new_sites_ch
+
+    script:
+    """
+    bgzip -c $new_sites > ${project}.new.sites.vcf.gz
+    bcftools index ${project}.new.sites.vcf.gz
+    bcftools index previous.sites.vcf.gz
+    bcftools concat --allow-overlaps -O u previous.sites.vcf.gz ${project}.new.sites.vcf.gz \
+        | bcftools sort -O z -o ${project}.sites.vcf.gz
+    """
+}
+
+
+merged_sites
+    .mix(updated_sites)
+    .into { genotype_sites; shard_sites; square_sites }
+
+
+process plan_genotype_shards {
+    input:
+    file sites from shard_sites
+
+    output:
+    file("shard-*.sites.vcf.gz") into genotype_shards
+
+    when: params.genotypeshards
+
+    script:
+    nshards = params.genotypeshards
+    write_vcfs = true
+    template 'plan_regions.py'
+}
+
+
+// each sample is genotyped against the full sites or each of its shards,
+// along with the number of parts it is gathered from
+(params.genotypeshards
+    ? genotype_shards.flatMap { shards -> [shards].flatten().collect { tuple(it, [shards].flatten().size()) } }
+    : genotype_sites.map { tuple(it, 1) })
+    .set { genotype_sites_ch }
+
+genotype_bams.into { genotype_new_bams; genotype_previous_bams }
+
+// previously genotyped samples only need the new sites
+genotype_new_bams
+    .filter { !(it[0] in previous_samples) }
+    .combine(genotype_sites_ch)
+    .map { sample, bam, bai, sites, nparts ->
+        def name = params.genotypeshards ? "${sample}.${sites.name.tokenize('.')[0]}" : sample
+        tuple(sample, name, bam, bai, sites, nparts)
+    }
+    .mix(
+        genotype_previous_bams
+            .filter { it[0] in previous_samples }
+            .combine(new_sites_ch)
+            // gathered with the previous genotypes
+            .map { sample, bam, bai, sites -> tuple(sample, "${sample}.incremental", bam, bai, sites, 2) }
+    )
+    .set { genotype_ch }
+
+
 process smoove_genotype {
-    publishDir path: "$outdir/smoove/genotyped", mode: "copy"
+    publishDir path: "$outdir/smoove/genotyped", mode: "copy", enabled: !params.genotypeshards, saveAs: { it.contains('.incremental-') ? null : it }
+    tag { input_tag(name, [bam, sites]) }
+    memory { model_memory('genotype', [bam, sites], task.attempt) }
+    time { model_time('genotype', [bam, sites], task.attempt) }
 
     input:
     env SMOOVE_KEEP_ALL from sensitive_genotype_ch
-    set sample, file(bam), file(bai) from genotype_bams
-    file sites
+    set sample, name, file(bam), file(bai), file(sites), nparts from genotype_ch
+    file ref_cache from genotype_ref_cache
     file fasta
     file faidx
 
     output:
-    file("${sample}-smoove.genotyped.vcf.gz.csi") into genotyped_idxs
-    file("${sample}-smoove.genotyped.vcf.gz") into genotyped_vcfs
+    set sample, nparts, file("${name}-smoove.genotyped.vcf.gz"), file("${name}-smoove.genotyped.vcf.gz.csi") into genotyped_parts
 
     script:
     """
-    wget -q https://raw.githubusercontent.com/samtools/samtools/develop/misc/seq_cache_populate.pl
-    perl seq_cache_populate.pl -root \$(pwd)/cache $fasta 1> /dev/null 2> err || (cat err; exit 2)
-    export REF_PATH=\$(pwd)/cache/%2s/%2s/%s:http://www.ebi.ac.uk/ena/cram/md5/%s
+    export REF_PATH=\$(pwd)/$ref_cache/%2s/%2s/%s
     export REF_CACHE=xx
 
     samtools quickcheck -v $bam
-    smoove genotype --duphold --processes ${task.cpus} --removepr --outdir ./ --name ${sample} --fasta $fasta --vcf $sites $bam
+    smoove genotype --duphold --processes ${task.cpus} --removepr --outdir ./ --name ${name} --fasta $fasta --vcf $sites $bam
     """
 }
 
 
+// shards and the new sites of previously genotyped samples are gathered
+genotyped_parts
+    .mix(previous_genotyped)
+    .into { gather_parts; whole_parts }
+gather_parts
+    .filter { params.genotypeshards || it[0] in previous_samples }
+    .set { gather_ch }
+whole_parts
+    .filter { !(params.genotypeshards || it[0] in previous_samples) }
+    .map { sample, nparts, vcf, idx -> tuple(sample, vcf, idx) }
+    .set { genotyped_whole }
+
+
+process gather_genotypes {
+    publishDir path: "$outdir/smoove/genotyped", mode: "copy"
+
+    input:
+    // parts are renamed as a previous run's output shares the final name
+    // samples are gathered as soon as all of their parts are done
+    set sample, file("part-*.vcf.gz"), file("part-*.vcf.gz.csi") from gather_ch
+        .map { sample, nparts, vcf, idx -> tuple(groupKey(sample, nparts), vcf, idx) }
+        .groupTuple()
+
+    output:
+    set sample, file("${sample}-smoove.genotyped.vcf.gz"), file("${sample}-smoove.genotyped.vcf.gz.csi") into genotyped_gathered
+
+    script:
+    """
+    bcftools concat --allow-overlaps -O u part-*.vcf.gz \
+        | bcftools sort -O z -o ${sample}-smoove.genotyped.vcf.gz
+    bcftools index ${sample}-smoove.genotyped.vcf.gz
+    """
+}
+
+
+genotyped_whole
+    .mix(genotyped_gathered.map { sample, vcf, idx -> tuple(sample.toString(), vcf, idx) })
+    .set { genotyped_ch }
+
+(square_batch_ch, square_flat_ch) = (params.squarebatch ? [genotyped_ch, Channel.empty()] : [Channel.empty(), genotyped_ch])
+square_flat_ch.into { genotyped_vcfs; genotyped_idxs }
+
+
 process smoove_square {
     publishDir path: "$outdir/smoove/annotated", mode: "copy", pattern: "*.vcf.gz*"
-    publishDir path: "$outdir/reports/bpbio", mode: "copy", pattern: "*.html"
+    tag { input_tag(project, vcf) }
+    memory { model_memory('square', vcf, task.attempt) }
+    time { model_time('square', vcf, task.attempt) }
 
     input:
-    file vcf from genotyped_vcfs.collect()
-    file idx from genotyped_idxs.collect()
+    set file(vcf), val(fingerprint) from genotyped_vcfs.map { it[1] }.collect().map { [it, fingerprint_files(it)] }
+    file idx from genotyped_idxs.map { it[2] }.collect()
     file gff
 
     output:
-    file("${project}.smoove.square.anno.vcf.gz") into square_vcf
-    file("${project}.smoove.square.anno.vcf.gz.csi") into square_idx
-    file("svvcf.html") into svvcf
+    file("${project}.smoove.square.anno.vcf.gz") into flat_square_vcf
+    file("${project}.smoove.square.anno.vcf.gz.csi") into flat_square_idx
+    file("${project}.smoove.square.summary.json") into flat_square_summary
+
+    when: !params.squarebatch
 
     script:
     smoovepaste = "smoove paste --outdir ./ --name $project $vcf"
-    if( vcf.collect().size() < 2 ) {
-        paste = "cp $vcf ${project}.smoove.square.vcf.gz && cp $idx ${project}.smoove.square.vcf.gz.csi"
+    ordercheck = record_order_check(vcf)
+    if( [vcf].flatten().size() < 2 ) {
+        smoovepaste = "cp $vcf ${project}.smoove.square.vcf.gz && cp $idx ${project}.smoove.square.vcf.gz.csi"
+        ordercheck = ""
     }
     """
+    $ordercheck
     $smoovepaste
 
-    smoove annotate --gff $gff ${project}.smoove.square.vcf.gz | bgzip --threads ${task.cpus} -c > ${project}.smoove.square.anno.vcf.gz
-    bcftools index ${project}.smoove.square.anno.vcf.gz
-    bpbio plot-sv-vcf ${project}.smoove.square.anno.vcf.gz
+    # annotated records are summarized as they are compressed. bgzip does not
+    # parse records and tabix only parses their positions, where bcftools
+    # would parse every sample's genotype
+    smoove annotate --gff $gff ${project}.smoove.square.vcf.gz \
+        | svsummary.py tee ${project}.smoove.square.summary.json \
+        | bgzip --threads ${task.cpus} -c > ${project}.smoove.square.anno.vcf.gz
+    tabix --csi -p vcf ${project}.smoove.square.anno.vcf.gz
     """
 }
 
 
-process run_indexcov {
-    publishDir path: "$outdir/reports/indexcov", mode: "copy"
+process square_paste_batch {
+    tag { input_tag(batch_label(vcf), vcf) }
+    memory { model_memory('square', vcf, task.attempt) }
+    time { model_time('square', vcf, task.attempt) }
 
     input:
-    file idx from index_ch.collect()
-    file faidx
+    set file(vcf), file(idx) from square_batch_ch.map { [it[1], it[2]] }.collate(params.squarebatch ?: 1).map { it.transpose() }
 
     output:
-    file("${project}*.png")
-    file("*.html")
-    file("${project}*.bed.gz") into bed_ch
-    file("${project}*.ped") into indexcov_ped_ch
-    file("${project}*.roc") into roc_ch
+    file("batch-*.smoove.square.vcf.gz") into square_batch_vcfs
+    file("batch-*.smoove.square.vcf.gz.csi") into square_batch_idxs
+
+    when: params.squarebatch
 
     script:
-    excludepatt = params.exclude ? "--excludepatt \"${params.exclude}\"" : ""
+    smoovepaste = "smoove paste --outdir ./ --name batch-${task.index} $vcf"
+    ordercheck = record_order_check(vcf)
+    if( [vcf].flatten().size() < 2 ) {
+        smoovepaste = "cp $vcf batch-${task.index}.smoove.square.vcf.gz"
+        ordercheck = ""
+    }
     """
-    goleft indexcov --sex $sexchroms $excludepatt --directory $project --fai $faidx $idx
-    mv $project/* .
+    $ordercheck
+    $smoovepaste
+    bcftools index --force batch-${task.index}.smoove.square.vcf.gz
+    """
+}
+
+
+process plan_square_regions {
+    input:
+    file sites from square_sites
+
+    output:
+    file("shard-*.regions") into square_regions
+
+    when: params.squarebatch
+
+    script:
+    nshards = params.squareshards
+    write_vcfs = false
+    template 'plan_regions.py'
+}
+
+
+process square_region {
+    tag { input_tag(regions.baseName, vcf) }
+    memory { model_memory('square_region', vcf, task.attempt) }
+    time { model_time('square_region', vcf, task.attempt) }
+
+    input:
+    file regions from square_regions.flatten()
+    file vcf from square_batch_vcfs.collect()
+    file idx from square_batch_idxs.collect()
+    file gff
+
+    output:
+    file("${regions.baseName}.anno.vcf.gz") into square_region_vcfs
+    file("${regions.baseName}.summary.json") into square_region_summaries
+
+    script:
+    // batches share the merged site IDs, so records are joined on ID and a
+    // record belongs to the region holding its start position
+    def join = [vcf].flatten().size() < 2 ? "bcftools view" : "bcftools merge --merge id"
+    """
+    i=0
+    while read chrom start end; do
+        i=\$((i + 1))
+        $join -r \$chrom:\$start-\$end -O u $vcf \
+            | bcftools view -i "POS>=\$start" -O b -o piece-\$(printf '%04d' \$i).bcf
+    done < $regions
+    bcftools concat -O z -o ${regions.baseName}.vcf.gz piece-*.bcf
+    smoove annotate --gff $gff ${regions.baseName}.vcf.gz \
+        | svsummary.py tee ${regions.baseName}.summary.json \
+        | bgzip -c > ${regions.baseName}.anno.vcf.gz
+    """
+}
+
+
+process square_concat {
+    publishDir path: "$outdir/smoove/annotated", mode: "copy", pattern: "*.vcf.gz*"
+    tag { input_tag(project, vcf) }
+    memory { model_memory('square_concat', vcf, task.attempt) }
+    time { model_time('square_concat', vcf, task.attempt) }
+
+    input:
+    set file(vcf), val(fingerprint) from square_region_vcfs.collect().map { [it, fingerprint_files(it)] }
+    file summary from square_region_summaries.collect()
+
+    output:
+    file("${project}.smoove.square.anno.vcf.gz") into tree_square_vcf
+    file("${project}.smoove.square.anno.vcf.gz.csi") into tree_square_idx
+    file("${project}.smoove.square.summary.json") into tree_square_summary
+
+    when: params.squarebatch
+
+    script:
+    // region names sort in genomic order
+    regions = [vcf].flatten().collect { it.name }.sort().join(" ")
+    """
+    # bcftools parses the records to concatenate them, so newer versions index
+    # in the same pass. The bcftools of brentp/smoove:v0.2.5 predates
+    # --write-index and the output is indexed by tabix
+    write_index=\$(grep -q -- --write-index <(bcftools concat --help 2>&1) && echo --write-index || true)
+    bcftools concat --threads ${task.cpus} -O z -o ${project}.smoove.square.anno.vcf.gz \$write_index $regions
+    [ -n "\$write_index" ] || tabix --csi -p vcf ${project}.smoove.square.anno.vcf.gz
+    svsummary.py merge ${project}.smoove.square.summary.json $summary
+    """
+}
+
+
+flat_square_vcf.mix(tree_square_vcf).into { plot_square_vcf; matrix_square_vcf; index_square_vcf; trace_gate }
+flat_square_idx.mix(tree_square_idx).set { square_idx }
+flat_square_summary.mix(tree_square_summary).set { square_summary }
+
+
+process plot_square_vcf {
+    // the workflow report reads the square VCF's summary JSON, so this is off its path
+    publishDir path: "$outdir/reports/bpbio", mode: "copy", pattern: "*.html"
+
+    input:
+    file vcf from plot_square_vcf
+
+    output:
+    file("svvcf.html")
+
+    script:
+    """
+    bpbio plot-sv-vcf $vcf
+    """
+}
+
+
+process export_matrix {
+    publishDir path: "$outdir/smoove/matrix", mode: "copy"
+
+    input:
+    file vcf from matrix_square_vcf
+
+    output:
+    file("${project}.matrix")
+
+    when: params.matrix
+
+    script:
+    template 'export_matrix.py'
+}
+
+
+process index_square_vcf {
+    publishDir path: "$outdir/smoove/index", mode: "copy"
+
+    input:
+    file vcf from index_square_vcf
+
+    output:
+    file("${project}.svindex.sqlite")
+
+    when: params.svindex
+
+    script:
+    """
+    svquery.py build $vcf ${project}.svindex.sqlite
     """
 }
 
 
 indexcov_ped_ch.into { ped_ch; report_ped_ch }
-// account for optional, custom ped and the need to merge that with indexcov output
-(merge_ch, report_ch) = (params.ped ? [ped_ch, Channel.empty()]: [Channel.empty(), ped_ch])
+// account for optional, custom ped and sample sheets and the need to merge them with indexcov output
+(merge_ch, report_ch) = (sample_sheets ? [ped_ch, Channel.empty()]: [Channel.empty(), ped_ch])
 
 
 process merge_peds {
@@ -302,13 +1312,31 @@ process merge_peds {
 
     input:
     file ped from merge_ch
-    file custom_ped
+    file sheets name 'sheet*' from Channel.value(sample_sheets)
 
     output:
     file 'merged.ped' into merged_ch
 
     script:
-    template 'merge_peds.py'
+    """
+    merge_peds.py $ped $sheets --samplecol ${params.samplecol} --output merged.ped
+    """
+}
+
+
+process downsample_coverage {
+    publishDir path: "$outdir/reports/indexcov", mode: "copy", pattern: "${project}.coverage"
+    label 'covviz'
+
+    input:
+    file bed from bed_ch
+
+    output:
+    file("${project}.coverage")
+    file("${project}.downsampled.bed.gz") into downsampled_bed_ch
+
+    script:
+    template 'downsample_coverage.py'
 }
 
 
@@ -319,7 +1347,7 @@ process build_covviz_report {
 
     input:
     file ped from report_ch.mix(merged_ch).collect()
-    file bed from bed_ch
+    file bed from downsampled_bed_ch
     file gff
 
     output:
@@ -341,20 +1369,25 @@ process somalier_extract {
     publishDir path: "$outdir/somalier/extract", mode: "copy"
 
     input:
-    set sample, file(bam), file(bai) from somalier_bams
+    // tasks take --somalierpack samples at a time; with --fused, only samples that are not called
+    set sample, file(bam), file(bai) from somalier_bams.filter { !params.fused || params.sites || it[0] in previous_samples }.collate(params.somalierpack ?: 1).map { it.transpose() }
+    file ref_cache from somalier_ref_cache
     file knownsites_file
     file fasta
     file faidx
 
     output:
-    file("${sample}.somalier") into somalier_counts
+    file("*.somalier") into somalier_counts
 
     // can be run even if user does not specify a ped file for `somalier relate`
     when: params.knownsites != false
 
     script:
     """
-    somalier extract --out-dir ./ --fasta $fasta --sites $knownsites_file $bam
+    export REF_PATH=\$(pwd)/$ref_cache/%2s/%2s/%s
+    export REF_CACHE=xx
+
+    printf '%s\\n' $bam | xargs -P ${task.cpus} -I{} somalier extract --out-dir ./ --fasta $fasta --sites $knownsites_file {}
     """
 }
 
@@ -364,7 +1397,7 @@ process somalier_relate {
     publishDir path: "$outdir/somalier", mode: "copy"
 
     input:
-    file somalier_count from somalier_counts.collect()
+    file somalier_count from somalier_counts.flatten().mix(fused_somalier_counts).collect()
     file custom_ped
 
     output:
@@ -381,20 +1414,72 @@ process somalier_relate {
 }
 
 
+process trace_summary {
+    // the trace is still being written; summarize the tasks finished so far
+    cache false
+
+    input:
+    val ready from trace_gate
+    file trace from Channel.value(file("$outdir/logs/trace.txt"))
+
+    output:
+    file("trace.html") into trace_html
+
+    script:
+    """
+    if [ -s $trace ]; then
+        trace_report.py --html --partial $trace > trace.html
+    else
+        touch trace.html
+    fi
+    """
+}
+
+
+// parsed counts of the previous report in this outdir
+report_cache = file("$outdir/logs/report.cache.json")
+
+
 process build_report {
     publishDir path: "$outdir/reports", mode: "copy", pattern: "*.html", overwrite: true
+    publishDir path: "$outdir/logs", mode: "copy", pattern: "report.cache.json", overwrite: true
     cache false
 
     input:
-    file sequence_count from sequence_counts.collect()
-    file variant_count from variant_counts.collect()
-    file vcf from square_vcf
+    // calls are absent when genotyping a fixed set of sites
+    file sequence_count from sequence_counts.collect().ifEmpty([])
+    file variant_count from variant_counts.collect().ifEmpty([])
+    file summary from square_summary
     file pedfile from report_ped_ch
-    file variant_html from svvcf
+    file trace_html
+    file qc from qc_report.collect().ifEmpty([])
+    // counts parsed by the last report; nothing is staged on a first run
+    file 'previous.report.cache.json' from Channel.value(report_cache.exists() ? report_cache : [])
 
     output:
     file("smoove-nf.html")
+    file("report.cache.json")
 
     script:
-    template 'smoove-report.py'
+    // listed under Configuration in the report
+    run_info = groovy.json.JsonOutput.toJson([
+        bams: params.bams, outdir: params.outdir, fasta: params.fasta, bed: params.bed, exclude: params.exclude,
+        project: params.project, gff: params.gff, repository: workflow.repository, revision: workflow.revision,
+        launchDir: workflow.launchDir, workDir: workflow.workDir, configFiles: workflow.configFiles,
+        container: workflow.container, containerEngine: workflow.containerEngine, commandLine: workflow.commandLine
+    ].collectEntries { key, value -> [key, value?.toString()] })
+    calls_skipped = params.sites ? "--calls-skipped" : ""
+    previous_cache = report_cache.exists() ? "--previous-cache previous.report.cache.json" : ""
+    // file lists are read from files to stay within the argument length limit
+    """
+    cat > run-info.json <<'EOF'
+    ${run_info}
+    EOF
+    printf '%s\\n' $sequence_count > sequence_counts.txt
+    printf '%s\\n' $variant_count > variant_counts.txt
+    smoove_report.py --summary $summary --ped $pedfile --trace-html $trace_html --qc $qc \\
+        --sequence-counts @sequence_counts.txt --variant-counts @variant_counts.txt \\
+        --run-info run-info.json --sexchroms $sexchroms --outdir $outdir $calls_skipped \\
+        $previous_cache --cpus ${task.cpus}
+    """
 }
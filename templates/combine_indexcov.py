@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import gzip
+import logging
+import re
+
+import numpy as np
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+batch_number = lambda f: int(re.search(r"batch-(\\d+)", f).group(1))
+bed_files = sorted("$bed".split(" "), key=batch_number)
+ped_files = sorted("$ped".split(" "), key=batch_number)
+roc_files = sorted("$roc".split(" "), key=batch_number)
+faidx_file = "$faidx"
+# indexcov matches sex chromosomes with or without a chr prefix
+normalize = lambda chrom: chrom[3:] if chrom.lower().startswith("chr") else chrom
+sex_chroms = set(normalize(c) for c in "$sexchroms".split(","))
+prefix = "${project}-indexcov"
+# bins sampled across autosomes for the principal components
+pca_bins = 5000
+pca_components = 5
+# rows of sampled bins allocated at a time
+pca_chunk = 1024
+
+
+def gzopen(f, mode="rt"):
+    return gzip.open(f, mode) if f.endswith(".gz") else open(f, mode)
+
+
+chrom_rank = {}
+autosomal_length = 0
+with open(faidx_file) as fh:
+    for i, line in enumerate(fh):
+        chrom, length = line.split("\\t")[:2]
+        chrom_rank[chrom] = i
+        if normalize(chrom) not in sex_chroms:
+            autosomal_length += int(length)
+# indexcov bins are 16KB; every step-th autosomal bin is kept for PCA
+pca_step = max(1, autosomal_length // 16384 // pca_bins)
+
+
+def join_columns(paths, keys, fill, out, on_row=None):
+    """Outer join of tables that share `keys` leading columns followed by
+    one column per sample, reading each in lockstep. Rows are ordered by
+    chromosome then by the second key, as indexcov writes them.
+    """
+    handles = [gzopen(p) for p in paths]
+    headers = [fh.readline().rstrip("\\n").split("\\t") for fh in handles]
+    widths = [len(h) - keys for h in headers]
+    print(*(headers[0][:keys] + [s for h in headers for s in h[keys:]]), sep="\\t", file=out)
+
+    def next_row(fh):
+        line = fh.readline()
+        if not line:
+            return None
+        toks = line.rstrip("\\n").split("\\t")
+        return (chrom_rank.get(toks[0], len(chrom_rank)), toks[0], float(toks[1])), toks
+
+    heads = [next_row(fh) for fh in handles]
+    while any(heads):
+        key = min(h[0] for h in heads if h)
+        row = None
+        values = []
+        for i, head in enumerate(heads):
+            if head and head[0] == key:
+                row = head[1][:keys]
+                values.extend(head[1][keys:])
+                heads[i] = next_row(handles[i])
+            else:
+                values.extend([fill] * widths[i])
+        print(*(row + values), sep="\\t", file=out)
+        if on_row:
+            on_row(row, values)
+    for fh in handles:
+        fh.close()
+    return [s for h in headers for s in h[keys:]]
+
+
+# a sample of the combined autosomal bins for PCA, bins by samples, grown
+# in chunks rather than held as a list of rows
+autosomal = [None]
+autosomal_rows = [0]
+autosomal_bins = [0]
+
+
+def keep_autosomal(row, values):
+    if normalize(row[0]) in sex_chroms:
+        return
+    if autosomal_bins[0] % pca_step == 0:
+        matrix, i = autosomal[0], autosomal_rows[0]
+        if matrix is None or i == matrix.shape[0]:
+            grown = np.empty((i + pca_chunk, len(values)), dtype=np.float32)
+            if matrix is not None:
+                grown[:i] = matrix
+            autosomal[0] = matrix = grown
+        matrix[i] = values
+        autosomal_rows[0] += 1
+    autosomal_bins[0] += 1
+
+
+def principal_components(matrix, k, oversample=10, iterations=4, seed=42):
+    """Scores of the top k principal components of the samples, the columns
+    of a bins by samples matrix that is centered per bin, by randomized SVD
+    (Halko, Martinsson, and Tropp 2011). The matrix is only multiplied by
+    thin matrices, so memory is linear in the number of samples.
+    """
+    a = matrix.T
+    rank = min(k + oversample, min(a.shape))
+    omega = np.random.RandomState(seed).standard_normal((a.shape[1], rank)).astype(np.float32)
+    q = np.linalg.qr(a.dot(omega))[0]
+    for _ in range(iterations):
+        q = np.linalg.qr(a.T.dot(q))[0]
+        q = np.linalg.qr(a.dot(q))[0]
+    u, s, _ = np.linalg.svd(q.T.dot(a), full_matrices=False)
+    return q.dot(u[:, :k]) * s[:k]
+
+
+with gzip.open("%s.bed.gz" % prefix, "wt") as out:
+    samples = join_columns(bed_files, 3, "0", out, keep_autosomal)
+with open("%s.roc" % prefix, "w") as out:
+    join_columns(roc_files, 2, "0", out)
+logging.info("combined %d samples from %d batches" % (len(samples), len(bed_files)))
+
+# principal components across every batch, as indexcov computes them per batch
+components = None
+if autosomal_rows[0] and len(samples) > pca_components:
+    matrix = autosomal[0][:autosomal_rows[0]]
+    matrix -= matrix.mean(axis=1)[:, np.newaxis]
+    components = principal_components(matrix, pca_components)
+sample_index = dict((s, i) for i, s in enumerate(samples))
+
+with open("%s.ped" % prefix, "w") as out:
+    header = None
+    for ped_file in ped_files:
+        with open(ped_file) as fh:
+            batch_header = fh.readline().rstrip("\\n").split("\\t")
+            if header is None:
+                header = batch_header
+                print(*header, sep="\\t", file=out)
+            for line in fh:
+                row = dict(zip(batch_header, line.rstrip("\\n").split("\\t")))
+                for i in range(pca_components):
+                    column = "PC%d" % (i + 1)
+                    if column in row and components is not None:
+                        row[column] = "%.2f" % components[sample_index[row["sample_id"]], i]
+                print(*[row.get(c, "") for c in header], sep="\\t", file=out)
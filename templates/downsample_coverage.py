@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import gzip
+import json
+import logging
+import os
+
+import numpy as np
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+bed_file = "$bed"
+# bins kept per chromosome for plotting
+max_bins = int("$params.covvizbins")
+matrix_dir = "${project}.coverage"
+output_file = "${project}.downsampled.bed.gz"
+
+
+# bins allocated at a time while reading a chromosome
+chunk_bins = 8192
+
+
+def grow(array, rows):
+    """A copy of array with room for rows along its first axis."""
+    grown = np.empty((rows,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def new_arrays(samples):
+    """Empty starts, ends, and matrix of a chromosome."""
+    return (np.empty(chunk_bins, dtype=np.int64), np.empty(chunk_bins, dtype=np.int64),
+            np.empty((chunk_bins, samples), dtype=np.float16))
+
+
+def read_chromosomes(path):
+    """Yields the samples and then (chrom, starts, ends, float16 matrix) of
+    each chromosome of an indexcov bed.gz, holding one chromosome at a time.
+    Values are parsed straight into the float16 matrix, which is grown in
+    chunks of bins.
+    """
+    with gzip.open(path, "rt") as fh:
+        samples = fh.readline().rstrip("\\n").split("\\t")[3:]
+        yield samples
+        chrom = None
+        n = 0
+        starts, ends, matrix = new_arrays(len(samples))
+        for line in fh:
+            toks = line.rstrip("\\n").split("\\t")
+            if toks[0] != chrom and n:
+                yield chrom, starts[:n], ends[:n], matrix[:n]
+                # new arrays, as the yielded views may still be in use
+                starts, ends, matrix = new_arrays(len(samples))
+                n = 0
+            chrom = toks[0]
+            if n == len(starts):
+                starts, ends, matrix = [grow(a, n + chunk_bins) for a in (starts, ends, matrix)]
+            starts[n] = int(toks[1])
+            ends[n] = int(toks[2])
+            matrix[n] = toks[3:]
+            n += 1
+        if n:
+            yield chrom, starts[:n], ends[:n], matrix[:n]
+
+
+def downsample(matrix, n):
+    """Indexes of at most n rows that keep the shape of every sample's profile:
+    the matrix is split into n windows of consecutive bins and the bin that
+    strays furthest from the expected depth of 1 in any sample represents its
+    window, so peaks and drops survive while flat stretches are thinned.
+    """
+    rows = matrix.shape[0]
+    if rows <= n:
+        return np.arange(rows)
+    deviation = np.nanmax(np.abs(matrix.astype(np.float32) - 1), axis=1)
+    deviation[np.isnan(deviation)] = -1
+    window = np.arange(rows) * n // rows
+    # the most deviant bin sorts first within its window
+    order = np.lexsort((-deviation, window))
+    first = np.ones(rows, dtype=bool)
+    first[1:] = window[order][1:] != window[order][:-1]
+    keep = np.sort(order[first])
+    return np.union1d(keep, [0, rows - 1])
+
+
+if not os.path.exists(matrix_dir):
+    os.makedirs(matrix_dir)
+chromosomes = read_chromosomes(bed_file)
+samples = next(chromosomes)
+index = dict(samples=samples, chromosomes=[])
+with gzip.open(output_file, "wt") as out:
+    print("#chrom", "start", "end", *samples, sep="\\t", file=out)
+    for chrom, starts, ends, matrix in chromosomes:
+        # bins by samples, memory-mappable with numpy.load(..., mmap_mode="r")
+        np.save(os.path.join(matrix_dir, "%s.npy" % chrom), matrix)
+        np.save(os.path.join(matrix_dir, "%s.starts.npy" % chrom), starts)
+        keep = downsample(matrix, max_bins)
+        logging.info("%s: %d bins, %d kept for plotting" % (chrom, len(starts), len(keep)))
+        index["chromosomes"].append(dict(chrom=chrom, bins=len(starts), bin_size=int(ends[0] - starts[0])))
+        for i in keep:
+            print(chrom, starts[i], ends[i], "\\t".join("%.3g" % v for v in matrix[i]), sep="\\t", file=out)
+with open(os.path.join(matrix_dir, "index.json"), "w") as fh:
+    json.dump(index, fh, indent=1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import gzip
+import json
+import logging
+import os
+import sys
+
+from array import array
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+vcf_file = "$vcf"
+fields = [i for i in "$params.matrixfields".split(",") if i and i != "false"]
+output_dir = "${project}.matrix"
+# python 2 has no "q" typecode; "l" is 64 bit on the platforms we run on
+try:
+    int64 = array("q").typecode
+except ValueError:
+    int64 = "l"
+if array(int64).itemsize != 8 or array("i").itemsize != 4:
+    sys.exit("64 and 32 bit integer arrays are required")
+# site table columns and their array typecodes
+site_columns = [("chrom", "i"), ("pos", int64), ("end", int64), ("svlen", int64), ("svtype", "b")]
+typecode_dtypes = {"b": "int8", "i": "int32", int64: "int64", "f": "float32"}
+missing = float("nan")
+# values buffered per output before writing
+block_values = 1 << 20
+
+
+def info_value(info, key):
+    for field in info.split(";"):
+        k, _, v = field.partition("=")
+        if k == key:
+            return v
+    return None
+
+
+def alt_count(gt, decoded={}):
+    """Non-reference alleles of a GT, -1 when entirely missing."""
+    if gt not in decoded:
+        alleles = gt.replace("|", "/").split("/")
+        called = [a for a in alleles if a != "."]
+        decoded[gt] = sum(1 for a in called if a != "0") if called else -1
+    return decoded[gt]
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return missing
+
+
+class Output(object):
+    """A raw array file written in blocks of values."""
+
+    def __init__(self, name, typecode):
+        self.fh = open(os.path.join(output_dir, "%s.bin" % name), "wb")
+        self.typecode = typecode
+        self.values = array(typecode)
+
+    def extend(self, values):
+        self.values.extend(values)
+        if len(self.values) >= block_values:
+            self.flush()
+
+    def flush(self):
+        self.values.tofile(self.fh)
+        self.values = array(self.typecode)
+
+    def close(self):
+        self.flush()
+        self.fh.close()
+
+
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+# arrays are appended a block at a time and never held in memory
+outputs = dict(genotypes=Output("genotypes", "b"))
+outputs.update((field, Output(field, "f")) for field in fields)
+outputs.update((column, Output(column, typecode)) for column, typecode in site_columns)
+samples = []
+chroms = []
+svtypes = []
+sites = 0
+with gzip.open(vcf_file, "rt") as fh:
+    for line in fh:
+        if line.startswith("##"):
+            continue
+        if line.startswith("#"):
+            samples = line.rstrip("\\n").split("\\t")[9:]
+            continue
+        toks = line.rstrip("\\n").split("\\t")
+        chrom, pos, info = toks[0], int(toks[1]), toks[7]
+        if not chroms or chroms[-1] != chrom:
+            chroms.append(chrom)
+        svtype = info_value(info, "SVTYPE") or "."
+        if svtype not in svtypes:
+            svtypes.append(svtype)
+        end = info_value(info, "END")
+        svlen = info_value(info, "SVLEN")
+        site = dict(chrom=len(chroms) - 1, pos=pos, end=int(end) if end else pos, svlen=abs(int(svlen)) if svlen else 0,
+                    svtype=svtypes.index(svtype))
+        for column, _ in site_columns:
+            outputs[column].extend([site[column]])
+
+        keys = toks[8].split(":")
+        columns = [s.split(":") for s in toks[9:]]
+        gt = keys.index("GT") if "GT" in keys else None
+        outputs["genotypes"].extend([alt_count(c[gt]) if gt is not None and gt < len(c) else -1 for c in columns])
+        for field in fields:
+            i = keys.index(field) if field in keys else None
+            outputs[field].extend([to_float(c[i]) if i is not None and i < len(c) else missing for c in columns])
+        sites += 1
+
+for out in outputs.values():
+    out.close()
+
+# shapes and types of the raw arrays for numpy.memmap, see bin/svmatrix.py
+arrays = dict(genotypes=dict(dtype="int8", shape=[sites, len(samples)]))
+for field in fields:
+    arrays[field] = dict(dtype="float32", shape=[sites, len(samples)])
+for column, typecode in site_columns:
+    arrays[column] = dict(dtype=typecode_dtypes[typecode], shape=[sites])
+with open(os.path.join(output_dir, "meta.json"), "w") as fh:
+    json.dump(dict(samples=samples, chroms=chroms, svtypes=svtypes, fields=fields, arrays=arrays,
+                   byteorder=sys.byteorder), fh, indent=1)
+logging.info("%d sites by %d samples written to %s" % (sites, len(samples), output_dir))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import bisect
+import gzip
+import hashlib
+import logging
+
+from collections import defaultdict
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+gzopen = lambda f: gzip.open(f, "rt") if f.endswith(".gz") else open(f)
+previous_sites_file = "previous.sites.vcf.gz"
+candidate_sites_file = "candidate.sites.vcf.gz"
+output_file = "new.sites.vcf"
+# candidates matching a previous site of the same type by this reciprocal
+# overlap (or BNDs within this distance) are already genotyped
+min_overlap = 0.5
+bnd_window = 1000
+
+
+def info_value(info, key):
+    for field in info.split(";"):
+        k, _, v = field.partition("=")
+        if k == key:
+            return v
+    return None
+
+
+def parse_site(line):
+    """Returns (chrom, svtype, start, end) of a sites VCF record."""
+    toks = line.split("\\t", 8)
+    chrom, start, info = toks[0], int(toks[1]), toks[7]
+    svtype = info_value(info, "SVTYPE") or "."
+    end = info_value(info, "END")
+    end = int(end) if end and svtype != "BND" else start
+    return chrom, svtype, start, max(start, end)
+
+
+class SiteIndex(object):
+    """Sorted start positions per (chrom, svtype) for overlap lookups."""
+
+    def __init__(self):
+        self.sites = defaultdict(list)
+
+    def add(self, chrom, svtype, start, end):
+        self.sites[(chrom, svtype)].append((start, end))
+
+    def finalize(self):
+        for key in self.sites:
+            self.sites[key].sort()
+        self.starts = dict((k, [s for s, _ in v]) for k, v in self.sites.items())
+
+    def contains(self, chrom, svtype, start, end):
+        key = (chrom, svtype)
+        if key not in self.sites:
+            return False
+        starts = self.starts[key]
+        if svtype == "BND":
+            lo = bisect.bisect_left(starts, start - bnd_window)
+            hi = bisect.bisect_right(starts, start + bnd_window)
+            return hi > lo
+        length = end - start + 1
+        # a site with enough reciprocal overlap has to start within this window
+        lo = bisect.bisect_left(starts, start - int(length * (1 - min_overlap) / min_overlap) - 1)
+        hi = bisect.bisect_right(starts, end)
+        for s, e in self.sites[key][lo:hi]:
+            overlap = min(end, e) - max(start, s) + 1
+            if overlap <= 0:
+                continue
+            if overlap >= min_overlap * length and overlap >= min_overlap * (e - s + 1):
+                return True
+        return False
+
+
+# new site IDs must not collide with those of the previous run. They are
+# prefixed with a hash of the records of both site sets rather than anything
+# of the run, so a resumed run writes the same new sites and its genotyping
+# tasks stay cached. Headers are left out as they may carry dates.
+digest = hashlib.md5()
+index = SiteIndex()
+with gzopen(previous_sites_file) as fh:
+    for line in fh:
+        if line.startswith("#"):
+            continue
+        digest.update(line.encode())
+        index.add(*parse_site(line))
+index.finalize()
+
+header = []
+records = []
+with gzopen(candidate_sites_file) as fh:
+    for line in fh:
+        if line.startswith("#"):
+            header.append(line)
+        else:
+            digest.update(line.encode())
+            records.append(line.split("\\t"))
+id_prefix = "n%s" % digest.hexdigest()[:10]
+
+novel_ids = set()
+for toks in records:
+    if not index.contains(*parse_site("\\t".join(toks))):
+        novel_ids.add(toks[2])
+# break end mates are kept or dropped together
+for toks in records:
+    mate = info_value(toks[7], "MATEID")
+    if mate and (mate in novel_ids or toks[2] in novel_ids):
+        novel_ids.update([mate, toks[2]])
+
+with open(output_file, "w") as out:
+    out.writelines(header)
+    for toks in records:
+        if toks[2] not in novel_ids:
+            continue
+        mate = info_value(toks[7], "MATEID")
+        if mate:
+            toks[7] = toks[7].replace("MATEID=%s" % mate, "MATEID=%s_%s" % (id_prefix, mate))
+        toks[2] = "%s_%s" % (id_prefix, toks[2])
+        out.write("\\t".join(toks))
+logging.info("%d of %d sites are not present in the previous sites" % (len(novel_ids), len(records)))
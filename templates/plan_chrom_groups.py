@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import logging
+import re
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+faidx_file = "$faidx"
+group_count = int("$ngroups")
+exclude = "$exclude"
+
+
+def excluded(chrom, patterns):
+    """Mirrors smoove's --excludechroms: `~` prefixed entries are regular
+    expressions, everything else is an exact chromosome name.
+    """
+    for patt in patterns:
+        if patt.startswith("~"):
+            if re.search(patt[1:], chrom):
+                return True
+        elif patt == chrom:
+            return True
+    return False
+
+
+def plan_groups(lengths, n):
+    """Longest-first assignment of chromosomes to the least loaded group."""
+    groups = [[0, []] for _ in range(max(1, min(n, len(lengths))))]
+    for chrom, length in sorted(lengths, key=lambda x: -x[1]):
+        group = min(groups, key=lambda g: g[0])
+        group[0] += length
+        group[1].append(chrom)
+    return groups
+
+
+patterns = [i for i in exclude.split(",") if i]
+lengths = []
+with open(faidx_file) as fh:
+    for line in fh:
+        chrom, length = line.split("\\t")[:2]
+        if not excluded(chrom, patterns):
+            lengths.append((chrom, int(length)))
+
+groups = plan_groups(lengths, group_count)
+for i, (size, chroms) in enumerate(groups):
+    name = "group-%04d" % (i + 1)
+    logging.info("%s: %d chromosomes, %d bp" % (name, len(chroms), size))
+    # calling is restricted to a group by excluding every other chromosome
+    members = set(chroms)
+    others = [chrom for chrom, _ in lengths if chrom not in members]
+    with open("%s.exclude" % name, "w") as fh:
+        print(",".join(patterns + others), file=fh)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import gzip
+import logging
+import subprocess
+
+from array import array
+from collections import OrderedDict
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+gzopen = lambda f: gzip.open(f, "rt") if f.endswith(".gz") else open(f)
+sites_file = "$sites"
+shard_count = int("$nshards")
+# write the records of each shard alongside its regions
+write_vcfs = "$write_vcfs" == "true"
+
+
+def read_positions(path):
+    """Positions of every record keyed by chromosome in file order."""
+    positions = OrderedDict()
+    with gzopen(path) as fh:
+        for line in fh:
+            if line.startswith("#"):
+                continue
+            chrom, pos = line.split("\\t", 2)[:2]
+            if chrom not in positions:
+                positions[chrom] = array("l")
+            positions[chrom].append(int(pos))
+    return positions
+
+
+def plan_shards(positions, n):
+    """Split records into at most n contiguous shards of similar record count.
+
+    Shards are cut only between distinct positions so that a record never
+    lands in more than one shard when regions are queried by position.
+    Returns a list of shards, each a list of (chrom, start, end, records).
+    """
+    total = sum(len(p) for p in positions.values())
+    n = max(1, min(n, total))
+    shards = []
+    current = []
+    seen = 0
+    for chrom, chrom_positions in positions.items():
+        start = None
+        records = 0
+        for i, pos in enumerate(chrom_positions):
+            if start is None:
+                start = pos
+            records += 1
+            seen += 1
+            boundary = len(shards) + 1
+            last_at_pos = i + 1 == len(chrom_positions) or chrom_positions[i + 1] != pos
+            if boundary < n and last_at_pos and seen >= total * boundary / float(n):
+                current.append((chrom, start, pos, records))
+                shards.append(current)
+                current = []
+                start = None
+                records = 0
+        if start is not None:
+            current.append((chrom, start, chrom_positions[-1], records))
+    if current or not shards:
+        shards.append(current)
+    return shards
+
+
+def shard_name(i):
+    return "shard-%04d" % (i + 1)
+
+
+positions = read_positions(sites_file)
+shards = plan_shards(positions, shard_count)
+shard_sizes = []
+for i, shard in enumerate(shards):
+    shard_sizes.append(sum(r[3] for r in shard))
+    logging.info("%s: %d regions, %d records" % (shard_name(i), len(shard), shard_sizes[-1]))
+    with open("%s.regions" % shard_name(i), "w") as fh:
+        for chrom, start, end, _ in shard:
+            print(chrom, start, end, sep="\\t", file=fh)
+
+if write_vcfs:
+    header = []
+    outputs = [open("%s.sites.vcf" % shard_name(i), "w") for i in range(len(shards))]
+    shard = 0
+    written = 0
+    with gzopen(sites_file) as fh:
+        for line in fh:
+            if line.startswith("#"):
+                header.append(line)
+                continue
+            if header:
+                for out in outputs:
+                    out.writelines(header)
+                header = []
+            # records are read in the same order they were planned
+            if written == shard_sizes[shard]:
+                shard += 1
+                written = 0
+            outputs[shard].write(line)
+            written += 1
+    for out in outputs:
+        # a sites file without records still needs a valid header
+        out.writelines(header)
+        out.close()
+        subprocess.check_call(["bgzip", "-f", out.name])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import gzip
+import logging
+import os
+import re
+
+from collections import OrderedDict
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+gzopen = lambda f: gzip.open(f, "rt") if f.endswith(".gz") else open(f)
+regions_file = "$regions"
+faidx_file = "$faidx"
+output_dir = "regions"
+
+
+lengths = OrderedDict()
+with open(faidx_file) as fh:
+    for line in fh:
+        chrom, length = line.split("\\t")[:2]
+        lengths[chrom] = int(length)
+
+intervals = dict()
+with gzopen(regions_file) as fh:
+    for line in fh:
+        if line.startswith(("#", "track", "browser")) or not line.strip():
+            continue
+        chrom, start, end = line.split("\\t")[:3]
+        if chrom not in lengths:
+            logging.warning("skipping region on %s which is not in %s" % (chrom, faidx_file))
+            continue
+        intervals.setdefault(chrom, []).append((max(0, int(start)), min(lengths[chrom], int(end))))
+
+if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+
+# sorted, non-overlapping intervals in reference order
+merged = OrderedDict()
+for chrom in lengths:
+    if chrom not in intervals:
+        continue
+    merged[chrom] = []
+    for start, end in sorted(intervals[chrom]):
+        if merged[chrom] and start <= merged[chrom][-1][1]:
+            merged[chrom][-1][1] = max(merged[chrom][-1][1], end)
+        else:
+            merged[chrom].append([start, end])
+
+# also the reads extracted with samtools view -M -L, so none is written twice
+with open(os.path.join(output_dir, "regions.bed"), "w") as fh:
+    for chrom, chrom_intervals in merged.items():
+        for start, end in chrom_intervals:
+            print(chrom, start, end, sep="\\t", file=fh)
+
+# everything outside of the regions, used as `smoove call --exclude`
+with open(os.path.join(output_dir, "exclude.bed"), "w") as fh:
+    for chrom, length in lengths.items():
+        last = 0
+        for start, end in merged.get(chrom, []):
+            if start > last:
+                print(chrom, last, start, sep="\\t", file=fh)
+            last = end
+        if last < length:
+            print(chrom, last, length, sep="\\t", file=fh)
+
+# chromosomes without regions as a regular expression for indexcov; an
+# empty pattern would match, and exclude, every chromosome
+others = [re.escape(chrom) for chrom in lengths if chrom not in merged]
+with open(os.path.join(output_dir, "excludepatt"), "w") as fh:
+    print("^(%s)\$" % "|".join(others) if others else "^\$", file=fh)
+
+logging.info("%d regions across %d chromosomes" % (sum(len(i) for i in merged.values()), len(merged)))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import csv
+import logging
+
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+quickcheck_file = "$quickcheck"
+ped_file = "$ped"
+output_file = "qc.tsv"
+# proportions of indexcov bins; samples above either fail
+max_low_bins = float("$params.qcmaxlo")
+max_outlier_bins = float("$params.qcmaxout")
+
+
+results = {}
+with open(quickcheck_file) as fh:
+    for line in fh:
+        if not line.strip():
+            continue
+        sample, status = line.strip().split("\\t")
+        results[sample] = [] if status == "pass" else ["failed quickcheck: %s" % status]
+
+with open(ped_file) as fh:
+    for row in csv.DictReader(fh, delimiter="\\t"):
+        sample = row["sample_id"]
+        if sample not in results:
+            continue
+        total = float(row["bins.in"]) + float(row["bins.out"])
+        if not total:
+            results[sample].append("no indexcov bins")
+            continue
+        low = float(row["bins.lo"]) / total
+        outliers = float(row["bins.out"]) / total
+        # same proportions as the report's bin counts plot
+        if low > max_low_bins:
+            results[sample].append("%.3f of bins with depth < 0.15 exceeds %g" % (low, max_low_bins))
+        if outliers > max_outlier_bins:
+            results[sample].append("%.3f of bins with depth outside of (0.85, 1.15) exceeds %g" % (outliers, max_outlier_bins))
+
+with open(output_file, "w") as fh:
+    print("sample", "status", "reasons", sep="\\t", file=fh)
+    for sample in sorted(results):
+        reasons = results[sample]
+        print(sample, "fail" if reasons else "pass", "; ".join(reasons), sep="\\t", file=fh)
+        if reasons:
+            logging.warning("%s fails QC: %s" % (sample, "; ".join(reasons)))
+logging.info("%d of %d samples pass QC" % (sum(1 for r in results.values() if not r), len(results)))